@@ -15,85 +15,791 @@ import cv2
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from torch.utils.data import DataLoader, TensorDataset
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
 import torchvision.transforms as transforms
-import gradio as gr
 import hashlib
 import json
+import os
+import copy
 import time
+import mmap
+import struct
+import zlib
+import queue
+import heapq
+import itertools
+import threading
+from multiprocessing import shared_memory
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from collections import OrderedDict
+from array import array
 from datetime import datetime
-import matplotlib.pyplot as plt
-from sklearn.metrics import accuracy_score, precision_score, recall_score
 import base64
+import tarfile
+import zipfile
 from io import BytesIO
 from PIL import Image
+import argparse
+import asyncio
+import bisect
+import atexit
+import contextlib
+import platform
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import warnings
 warnings.filterwarnings('ignore')
 
-# Install required packages
-import subprocess
-import sys
+# Optional faster content hashing
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+# Optional Parquet output for bulk scans
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Trained detector weights are cached here so workers skip _initialize_model's training
+DEFAULT_CHECKPOINT_PATH = os.environ.get('DEEPFAKE_DETECTOR_CHECKPOINT', 'deepfake_detector.pt')
+
+class _Span:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+class Metrics:
+    """Per-stage latency histograms, counters and gauges rendered in Prometheus text format
 
-def install_packages():
-    packages = [
-        'torch', 'torchvision', 'opencv-python', 'gradio',
-        'matplotlib', 'sklearn', 'pillow', 'numpy'
-    ]
-    for package in packages:
+    Disabled by default: span() then returns a shared no-op context manager
+    and increment() returns immediately, so instrumented code pays almost
+    nothing.
+    """
+
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, enabled=False, prefix='deepfake'):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.sampled_counters = {}
+        self._lock = threading.Lock()
+        self._null_span = contextlib.nullcontext()
+
+    def span(self, stage):
+        """Time a block of code as one observation of `stage`"""
+        if not self.enabled:
+            return self._null_span
+        return _Span(self, stage)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = {'buckets': [0] * (len(self.BUCKETS) + 1), 'sum': 0.0, 'count': 0}
+            histogram['buckets'][bisect.bisect_left(self.BUCKETS, seconds)] += 1
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+
+    def increment(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def register_gauge(self, name, function, help_text=''):
+        """Register a callable sampled whenever metrics are rendered"""
+        self.gauges[name] = (function, help_text)
+
+    def register_counter(self, name, function, help_text=''):
+        """Register a callable returning a monotonic total, sampled whenever metrics are rendered"""
+        self.sampled_counters[name] = (function, help_text)
+
+    def render_prometheus(self):
+        lines = []
+        name = f"{self.prefix}_stage_duration_seconds"
+        lines.append(f"# HELP {name} Time spent in each analysis pipeline stage")
+        lines.append(f"# TYPE {name} histogram")
+        with self._lock:
+            histograms = {stage: dict(h, buckets=list(h['buckets'])) for stage, h in self.histograms.items()}
+            counters = dict(self.counters)
+
+        for stage, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(self.BUCKETS + (float('inf'),), histogram['buckets']):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {histogram["sum"]}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {histogram["count"]}')
+
+        for counter, value in sorted(counters.items()):
+            lines.append(f"# TYPE {self.prefix}_{counter}_total counter")
+            lines.append(f"{self.prefix}_{counter}_total {value}")
+
+        for counter, (function, help_text) in sorted(self.sampled_counters.items()):
+            try:
+                value = function()
+            except Exception:
+                continue
+            if help_text:
+                lines.append(f"# HELP {self.prefix}_{counter}_total {help_text}")
+            lines.append(f"# TYPE {self.prefix}_{counter}_total counter")
+            lines.append(f"{self.prefix}_{counter}_total {value}")
+
+        for gauge, (function, help_text) in sorted(self.gauges.items()):
+            try:
+                value = function()
+            except Exception:
+                continue
+            if help_text:
+                lines.append(f"# HELP {self.prefix}_{gauge} {help_text}")
+            lines.append(f"# TYPE {self.prefix}_{gauge} gauge")
+            lines.append(f"{self.prefix}_{gauge} {value}")
+
+        return "\n".join(lines) + "\n"
+
+# Process-wide metrics registry; enabled by start_metrics_server() or DEEPFAKE_METRICS_PORT
+metrics = Metrics()
+
+def start_metrics_server(port=9100, host='0.0.0.0'):
+    """Enable metrics and serve them at http://host:port/metrics from a daemon thread"""
+    metrics.enabled = True
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
+
+@contextlib.contextmanager
+def profile_capture(kind, output_path):
+    """Capture a cProfile stats file or a torch profiler Chrome trace around a block"""
+    if kind == 'cprofile':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
         try:
-            __import__(package.replace('-', '_'))
-        except ImportError:
-            subprocess.check_call([sys.executable, "-m", "pip", "install", package])
+            yield profiler
+        finally:
+            profiler.disable()
+            profiler.dump_stats(output_path)
+    elif kind == 'torch':
+        with torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=True) as profiler:
+            yield profiler
+        profiler.export_chrome_trace(output_path)
+    else:
+        raise ValueError(f"Unknown profiler: {kind}")
+
+def compute_block_hash(index, timestamp, data, previous_hash):
+    """SHA-256 over the block fields, as used for chain links"""
+    value = str(index) + str(timestamp) + str(data) + str(previous_hash)
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()
+
+def merkle_root(hashes):
+    """Compute the Merkle root of a list of hex digests"""
+    if not hashes:
+        return hashlib.sha256(b'').hexdigest()
+
+    level = list(hashes)
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [
+            hashlib.sha256((level[i] + level[i + 1]).encode('utf-8')).hexdigest()
+            for i in range(0, len(level), 2)
+        ]
+    return level[0]
+
+def merkle_proof(hashes, position):
+    """Return the sibling path proving hashes[position] is under merkle_root(hashes)"""
+    proof = []
+    level = list(hashes)
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        sibling = position ^ 1
+        proof.append([level[sibling], 'left' if sibling < position else 'right'])
+        level = [
+            hashlib.sha256((level[i] + level[i + 1]).encode('utf-8')).hexdigest()
+            for i in range(0, len(level), 2)
+        ]
+        position //= 2
+    return proof
+
+def verify_merkle_proof(leaf_hash, proof, root):
+    """Check a sibling path produced by merkle_proof against a Merkle root"""
+    current = leaf_hash
+    for sibling, side in proof:
+        pair = sibling + current if side == 'left' else current + sibling
+        current = hashlib.sha256(pair.encode('utf-8')).hexdigest()
+    return current == root
+
+CONTENT_HASH_ALGORITHMS = ('sha256', 'blake2b', 'blake3', 'jpeg-sha256')
+
+def _new_hasher(algorithm):
+    if algorithm == 'sha256':
+        return hashlib.sha256()
+    if algorithm == 'blake2b':
+        return hashlib.blake2b(digest_size=32)
+    if algorithm == 'blake3':
+        if blake3 is None:
+            raise ValueError("blake3 hashing needs the 'blake3' package")
+        return blake3.blake3()
+    raise ValueError(f"Unknown content hash algorithm: {algorithm}")
+
+def hash_content(content, algorithm='sha256', chunk_size=1 << 20):
+    """Hash an image array, raw bytes or a file path
+
+    Returns (hex digest, number of bytes hashed, content format). Arrays
+    are hashed as a shape/dtype header followed by their contiguous pixel
+    buffer, fed to the hasher in memoryview chunks without copying, so the
+    hash is independent of any encoder. 'jpeg-sha256' reproduces the older
+    hash over a JPEG re-encode for registries created before raw hashing.
+    """
+    if isinstance(content, Image.Image):
+        content = np.asarray(content)
+
+    if algorithm == 'jpeg-sha256':
+        image_bytes = cv2.imencode('.jpg', content)[1].tobytes()
+        return hashlib.sha256(image_bytes).hexdigest(), len(image_bytes), 'image/jpeg'
+
+    hasher = _new_hasher(algorithm)
+    if isinstance(content, str):
+        size = 0
+        with open(content, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                hasher.update(chunk)
+                size += len(chunk)
+        return hasher.hexdigest(), size, 'file'
+
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        buffer = memoryview(content).cast('B')
+        content_format = 'file'
+    else:
+        content = np.ascontiguousarray(content)
+        hasher.update(f"{content.shape}|{content.dtype.str}".encode('ascii'))
+        buffer = memoryview(content).cast('B')
+        content_format = 'raw-pixels'
+
+    for start in range(0, len(buffer), chunk_size):
+        hasher.update(buffer[start:start + chunk_size])
+    return hasher.hexdigest(), len(buffer), content_format
+
+def block_content_hashes(block):
+    """Return the content hashes registered by a block"""
+    data = block['data']
+    if isinstance(data, dict):
+        if data.get('type') == 'merkle_batch':
+            return [entry['content_hash'] for entry in data['entries']]
+        if 'content_hash' in data:
+            return [data['content_hash']]
+    return []
+
+class BlockLedger:
+    """Append-only on-disk block log with memory-mapped reads
+
+    Each record is a header (meta length, payload length, CRC32) followed by
+    the newline-joined content hashes of the block and its JSON payload, so a
+    restart can rebuild the content index from headers without parsing blocks.
+    Only record offsets and the latest block are kept in memory.
+    """
 
-install_packages()
+    RECORD_HEADER = struct.Struct('<III')
+
+    def __init__(self, path, sync_every=64, sync_interval=0.05):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.offsets = array('Q')
+        self._lock = threading.RLock()
+        self._mmap = None
+        self._latest_block = None
+        self._pending_syncs = 0
+        self._sync_timer = None
+
+        self._size = self._replay()
+        self._file = open(path, 'ab')
+
+    def _replay(self):
+        """Scan record headers to rebuild offsets, dropping a torn final record"""
+        if not os.path.exists(self.path):
+            return 0
+
+        size = os.path.getsize(self.path)
+        valid_size = 0
+        with open(self.path, 'rb') as f:
+            while valid_size + self.RECORD_HEADER.size <= size:
+                f.seek(valid_size)
+                meta_len, payload_len, checksum = self.RECORD_HEADER.unpack(f.read(self.RECORD_HEADER.size))
+                record_end = valid_size + self.RECORD_HEADER.size + meta_len + payload_len
+                if record_end > size:
+                    break
+                if record_end == size:
+                    # Only the last record can be half-written, so only it needs a checksum pass
+                    if zlib.crc32(f.read(meta_len + payload_len)) != checksum:
+                        break
+                self.offsets.append(valid_size)
+                valid_size = record_end
+
+        if valid_size != size:
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_size)
+        return valid_size
+
+    @classmethod
+    def read_blocks(cls, path, start, end):
+        """Yield the blocks stored between two byte offsets of a ledger file"""
+        with open(path, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+
+        offset = 0
+        while offset < len(data):
+            meta_len, payload_len, _ = cls.RECORD_HEADER.unpack_from(data, offset)
+            payload_start = offset + cls.RECORD_HEADER.size + meta_len
+            yield json.loads(data[payload_start:payload_start + payload_len])
+            offset = payload_start + payload_len
+
+    def byte_range(self, start, end):
+        """Return the byte offsets spanning blocks [start, end)"""
+        end_offset = self.offsets[end] if end < len(self.offsets) else self._size
+        return self.offsets[start], end_offset
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, position):
+        with self._lock:
+            if position < 0:
+                position += len(self.offsets)
+            if not 0 <= position < len(self.offsets):
+                raise IndexError('ledger index out of range')
+            if position == len(self.offsets) - 1 and self._latest_block is not None:
+                return self._latest_block
+            return json.loads(self._read_record(position)[1])
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self[position]
+
+    def _read_record(self, position):
+        offset = self.offsets[position]
+        end = self.offsets[position + 1] if position + 1 < len(self.offsets) else self._size
+        view = self._mapped(end)
+        meta_len, payload_len, _ = self.RECORD_HEADER.unpack_from(view, offset)
+        meta_start = offset + self.RECORD_HEADER.size
+        payload_start = meta_start + meta_len
+        return view[meta_start:payload_start], view[payload_start:payload_start + payload_len]
+
+    def _mapped(self, end):
+        """Return a memory map covering at least the first `end` bytes of the log"""
+        if self._mmap is None or len(self._mmap) < end:
+            self._file.flush()
+            if self._mmap is not None:
+                self._mmap.close()
+            with open(self.path, 'rb') as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def iter_content_hashes(self):
+        """Yield (content_hash, block_index) pairs read from record headers only"""
+        with self._lock:
+            for position in range(len(self.offsets)):
+                meta, _ = self._read_record(position)
+                if meta:
+                    for content_hash in bytes(meta).decode('ascii').split('\n'):
+                        yield content_hash, position
+
+    def append(self, block):
+        meta = '\n'.join(block_content_hashes(block)).encode('ascii')
+        payload = json.dumps(block, separators=(',', ':')).encode('utf-8')
+        header = self.RECORD_HEADER.pack(len(meta), len(payload), zlib.crc32(meta + payload))
+
+        with self._lock:
+            self._file.write(header + meta + payload)
+            self.offsets.append(self._size)
+            self._size += len(header) + len(meta) + len(payload)
+            self._latest_block = block
+
+            # Group commit: fsync once per sync_every appends or sync_interval seconds
+            self._pending_syncs += 1
+            if self._pending_syncs >= self.sync_every:
+                self.sync()
+            elif self._sync_timer is None:
+                self._sync_timer = threading.Timer(self.sync_interval, self.sync)
+                self._sync_timer.daemon = True
+                self._sync_timer.start()
+
+    def sync(self):
+        """Flush and fsync all appended records"""
+        with self._lock:
+            if self._sync_timer is not None:
+                self._sync_timer.cancel()
+                self._sync_timer = None
+            if self._pending_syncs and not self._file.closed:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            self._pending_syncs = 0
+
+    def close(self):
+        with self._lock:
+            self.sync()
+            self._file.close()
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+
+def _validate_chunk(task):
+    """Validate one run of consecutive blocks (runs inside the process pool)"""
+    first_index, blocks, path, start, end = task
+    if blocks is None:
+        blocks = BlockLedger.read_blocks(path, start, end)
+
+    result = {'invalid_index': None, 'first_previous_hash': None, 'last_hash': None, 'merkle_root': None}
+    block_hashes = []
+    for expected_index, block in enumerate(blocks, first_index):
+        if expected_index == first_index:
+            result['first_previous_hash'] = block['previous_hash']
+        elif block['previous_hash'] != result['last_hash']:
+            result['invalid_index'] = expected_index
+            return result
+
+        expected_hash = compute_block_hash(block['index'], block['timestamp'], block['data'], block['previous_hash'])
+        if block['index'] != expected_index or block['hash'] != expected_hash:
+            result['invalid_index'] = expected_index
+            return result
+
+        block_hashes.append(block['hash'])
+        result['last_hash'] = block['hash']
+
+    result['merkle_root'] = merkle_root(block_hashes)
+    return result
 
 class SimpleBlockchain:
     """Simplified blockchain for content verification"""
 
-    def __init__(self):
-        self.chain = []
-        self.create_genesis_block()
+    def __init__(self, storage_path=None, sync_every=64, sync_interval=0.05, checkpoint_interval=10000,
+                 batch_size=0, batch_max_wait=1.0, hash_algorithm='sha256'):
+        if hash_algorithm not in CONTENT_HASH_ALGORITHMS:
+            raise ValueError(f"Unknown content hash algorithm: {hash_algorithm}")
+        # Content hashes in one registry must all come from the same algorithm; a ledger records its own
+        self.hash_algorithm = hash_algorithm
+        self._lock = threading.RLock()
+
+        # Blocks live in memory unless a ledger path is given
+        if storage_path:
+            self.chain = BlockLedger(storage_path, sync_every, sync_interval)
+        else:
+            self.chain = []
+        # content_hash -> index of the block that first registered it
+        self.content_index = {}
+
+        # Trusted validation checkpoints, one per checkpoint_interval blocks
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_path = storage_path + '.checkpoints' if storage_path else None
+        self.checkpoints = []
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                self.checkpoints = json.load(f)
+
+        # Registrations waiting to be sealed into one Merkle batch block (batch_size=0 disables batching)
+        self.batch_size = batch_size
+        self.batch_max_wait = batch_max_wait
+        self.pending_registrations = []
+        self.pending_index = {}
+        self._seal_timer = None
+
+        if len(self.chain) == 0:
+            self.create_genesis_block()
+        else:
+            self.rebuild_index()
+
+        self.meta_path = storage_path + '.meta' if storage_path else None
+        if self.meta_path:
+            self._check_hash_algorithm()
+
+    def _check_hash_algorithm(self):
+        """Refuse to reopen a ledger with a different content hash algorithm than it was written with"""
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                stored = json.load(f)['hash_algorithm']
+        else:
+            stored = self._registered_hash_algorithm()
+        if stored is not None and stored != self.hash_algorithm:
+            raise ValueError(
+                f"Ledger content hashes use {stored!r}, not {self.hash_algorithm!r}; "
+                f"reopen it with hash_algorithm={stored!r}"
+            )
+        with open(self.meta_path, 'w') as f:
+            json.dump({'hash_algorithm': self.hash_algorithm}, f)
+
+    def _registered_hash_algorithm(self):
+        """Algorithm recorded by the latest registration, for ledgers written before the .meta file"""
+        for index in range(len(self.chain) - 1, 0, -1):
+            data = self.chain[index]['data']
+            if not isinstance(data, dict):
+                continue
+            entries = data.get('entries') if data.get('type') == 'merkle_batch' else [data]
+            for entry in entries:
+                if 'content_hash' in entry:
+                    # Registrations only record the algorithm since raw-pixel hashing replaced JPEG hashing
+                    return entry.get('metadata', {}).get('hash_algorithm', 'jpeg-sha256')
+        return None
 
     def create_genesis_block(self):
+        # Hash the same timestamp that is stored so the genesis block validates
+        timestamp = time.time()
         genesis_block = {
             'index': 0,
-            'timestamp': time.time(),
+            'timestamp': timestamp,
             'data': 'Genesis Block',
             'previous_hash': '0',
-            'hash': self.calculate_hash(0, time.time(), 'Genesis Block', '0')
+            'hash': self.calculate_hash(0, timestamp, 'Genesis Block', '0')
         }
         self.chain.append(genesis_block)
 
     def calculate_hash(self, index, timestamp, data, previous_hash):
-        value = str(index) + str(timestamp) + str(data) + str(previous_hash)
-        return hashlib.sha256(value.encode('utf-8')).hexdigest()
+        return compute_block_hash(index, timestamp, data, previous_hash)
 
     def get_latest_block(self):
         return self.chain[-1]
 
     def add_block(self, data):
-        latest_block = self.get_latest_block()
-        new_block = {
-            'index': latest_block['index'] + 1,
-            'timestamp': time.time(),
-            'data': data,
-            'previous_hash': latest_block['hash'],
-            'hash': None
+        with self._lock:
+            latest_block = self.get_latest_block()
+            new_block = {
+                'index': latest_block['index'] + 1,
+                'timestamp': time.time(),
+                'data': data,
+                'previous_hash': latest_block['hash'],
+                'hash': None
+            }
+            new_block['hash'] = self.calculate_hash(
+                new_block['index'],
+                new_block['timestamp'],
+                new_block['data'],
+                new_block['previous_hash']
+            )
+            self.chain.append(new_block)
+            self._index_block(new_block)
+            return new_block['hash']
+
+    def pending_ticket(self, content_hash):
+        """Ticket for content waiting in the current batch, or None if it is not pending"""
+        with self._lock:
+            position = self.pending_index.get(content_hash)
+            if position is None:
+                return None
+            return {'status': 'pending_batch', 'content_hash': content_hash, 'batch_position': position}
+
+    def queue_registration(self, data):
+        """Queue content for the next Merkle batch block instead of adding a block now
+
+        Only the registration that fills the batch gets its inclusion proof
+        in the returned ticket; for the others call get_inclusion_proof once
+        the batch is sealed.
+        """
+        with self._lock:
+            content_hash = data['content_hash']
+            if content_hash in self.content_index:
+                # Sealed since the caller last checked
+                return {'status': 'registered', 'content_hash': content_hash,
+                        'inclusion_proof': self.get_inclusion_proof(content_hash)}
+            if content_hash not in self.pending_index:
+                self.pending_index[content_hash] = len(self.pending_registrations)
+                self.pending_registrations.append(data)
+
+            ticket = {
+                'status': 'pending_batch',
+                'content_hash': content_hash,
+                'batch_position': self.pending_index[content_hash]
+            }
+
+            if len(self.pending_registrations) >= self.batch_size:
+                self.seal_pending()
+                ticket['status'] = 'registered'
+                ticket['inclusion_proof'] = self.get_inclusion_proof(content_hash)
+            elif self._seal_timer is None:
+                # Seal partial batches after batch_max_wait so quiet periods still commit
+                self._seal_timer = threading.Timer(self.batch_max_wait, self.seal_pending)
+                self._seal_timer.daemon = True
+                self._seal_timer.start()
+            return ticket
+
+    def seal_pending(self):
+        """Commit pending registrations as one block holding their Merkle root"""
+        with self._lock:
+            if self._seal_timer is not None:
+                self._seal_timer.cancel()
+                self._seal_timer = None
+            if not self.pending_registrations:
+                return None
+
+            block_hash = self._add_merkle_batch(self.pending_registrations)
+            self.pending_registrations = []
+            self.pending_index = {}
+            return block_hash
+
+    def register_batch(self, entries):
+        """Register many items at once as one Merkle batch block, skipping content already registered
+
+        Returns the new block's hash, or None when every entry was already known.
+        """
+        with self._lock:
+            fresh, seen = [], set()
+            for entry in entries:
+                content_hash = entry['content_hash']
+                if content_hash in self.content_index or content_hash in self.pending_index or content_hash in seen:
+                    continue
+                seen.add(content_hash)
+                fresh.append(entry)
+            if not fresh:
+                return None
+            return self._add_merkle_batch(fresh)
+
+    def _add_merkle_batch(self, entries):
+        return self.add_block({
+            'type': 'merkle_batch',
+            'merkle_root': merkle_root([entry['content_hash'] for entry in entries]),
+            'entries': entries
+        })
+
+    def get_inclusion_proof(self, content_hash):
+        """Return a compact Merkle inclusion proof for content sealed in a batch block"""
+        is_verified, block = self.verify_content(content_hash)
+        if not is_verified or not isinstance(block['data'], dict) or block['data'].get('type') != 'merkle_batch':
+            return None
+
+        leaves = [entry['content_hash'] for entry in block['data']['entries']]
+        return {
+            'content_hash': content_hash,
+            'block_index': block['index'],
+            'block_hash': block['hash'],
+            'merkle_root': block['data']['merkle_root'],
+            'proof': merkle_proof(leaves, leaves.index(content_hash))
         }
-        new_block['hash'] = self.calculate_hash(
-            new_block['index'],
-            new_block['timestamp'],
-            new_block['data'],
-            new_block['previous_hash']
-        )
-        self.chain.append(new_block)
-        return new_block['hash']
+
+    def _index_block(self, block):
+        for content_hash in block_content_hashes(block):
+            self.content_index.setdefault(content_hash, block['index'])
+
+    def rebuild_index(self):
+        """Rebuild the content hash index from the blocks in the chain"""
+        self.content_index = {}
+        if isinstance(self.chain, BlockLedger):
+            for content_hash, block_index in self.chain.iter_content_hashes():
+                self.content_index.setdefault(content_hash, block_index)
+        else:
+            for block in self.chain:
+                self._index_block(block)
+
+    def load_chain(self, chain):
+        """Replace the in-memory chain with previously saved blocks and re-index them"""
+        self.close()
+        self.chain = list(chain)
+        self.rebuild_index()
+
+    def validate_chain(self, workers=None, use_checkpoints=True):
+        """Verify block hashes and links, resuming after the last trusted checkpoint"""
+        start, previous_hash = 0, '0'
+        if use_checkpoints and self.checkpoints:
+            checkpoint = self.checkpoints[-1]
+            # The checkpoint is only trusted while its anchor block is unchanged
+            if checkpoint['index'] < len(self.chain) and self.chain[checkpoint['index']]['hash'] == checkpoint['hash']:
+                start, previous_hash = checkpoint['index'] + 1, checkpoint['hash']
+        if start == 0:
+            self.checkpoints = []
+
+        # Chunks line up with checkpoint boundaries so each one can seal a checkpoint
+        end = len(self.chain)
+        tasks = []
+        for chunk_start in range(start, end, self.checkpoint_interval):
+            chunk_end = min(chunk_start + self.checkpoint_interval, end)
+            if isinstance(self.chain, BlockLedger):
+                self.chain.sync()
+                byte_start, byte_end = self.chain.byte_range(chunk_start, chunk_end)
+                tasks.append((chunk_start, None, self.chain.path, byte_start, byte_end))
+            else:
+                tasks.append((chunk_start, self.chain[chunk_start:chunk_end], None, None, None))
+
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+                results = list(executor.map(_validate_chunk, tasks))
+        else:
+            results = [_validate_chunk(task) for task in tasks]
+
+        report = {'valid': True, 'first_invalid_index': None, 'blocks_checked': end - start, 'resumed_from': start}
+        for task, result in zip(tasks, results):
+            chunk_start = task[0]
+            if result['invalid_index'] is not None:
+                report.update(valid=False, first_invalid_index=result['invalid_index'])
+                break
+            if result['first_previous_hash'] != previous_hash:
+                report.update(valid=False, first_invalid_index=chunk_start)
+                break
+            previous_hash = result['last_hash']
+
+            if chunk_start + self.checkpoint_interval <= end:
+                self.checkpoints.append({
+                    'index': chunk_start + self.checkpoint_interval - 1,
+                    'hash': result['last_hash'],
+                    'merkle_root': result['merkle_root']
+                })
+
+        self._save_checkpoints()
+        return report
+
+    def _save_checkpoints(self):
+        if self.checkpoint_path:
+            with open(self.checkpoint_path, 'w') as f:
+                json.dump(self.checkpoints, f)
+
+    def close(self):
+        """Seal pending registrations and close the on-disk ledger, if any"""
+        self.seal_pending()
+        if isinstance(self.chain, BlockLedger):
+            self.chain.close()
 
     def verify_content(self, content_hash):
-        for block in self.chain:
-            if isinstance(block['data'], dict) and block['data'].get('content_hash') == content_hash:
-                return True, block
-        return False, None
+        block_index = self.content_index.get(content_hash)
+        if block_index is None:
+            return False, None
+        return True, self.chain[block_index]
+
+    def verify_many(self, content_hashes):
+        """Verify several content hashes, returning (is_verified, block) pairs in order"""
+        return [self.verify_content(content_hash) for content_hash in content_hashes]
 
 class DeepfakeDetector(nn.Module):
     """Enhanced CNN for deepfake detection"""
@@ -127,7 +833,7 @@ class DeepfakeDetector(nn.Module):
         x = self.pool(F.relu(self.batch_norm4(self.conv4(x))))
 
         x = self.adaptive_pool(x)
-        x = x.view(x.size(0), -1)
+        x = torch.flatten(x, 1)
 
         x = F.relu(self.fc1(x))
         x = self.dropout(x)
@@ -137,67 +843,2070 @@ class DeepfakeDetector(nn.Module):
 
         return F.softmax(x, dim=1)
 
+INFERENCE_MODES = ('fp32', 'fused', 'dynamic_int8', 'static_int8')
+
+class QuantizableDeepfakeDetector(nn.Module):
+    """DeepfakeDetector rebuilt from module ReLUs and quant stubs so it can be fused and quantized"""
+
+    def __init__(self, detector, channels_last=True):
+        super(QuantizableDeepfakeDetector, self).__init__()
+        detector = copy.deepcopy(detector).eval()
+        self.channels_last = channels_last
+
+        self.quant = torch.ao.quantization.QuantStub()
+        self.block1 = nn.Sequential(detector.conv1, detector.batch_norm1, nn.ReLU())
+        self.block2 = nn.Sequential(detector.conv2, detector.batch_norm2, nn.ReLU())
+        self.block3 = nn.Sequential(detector.conv3, detector.batch_norm3, nn.ReLU())
+        self.block4 = nn.Sequential(detector.conv4, detector.batch_norm4, nn.ReLU())
+        self.pool = nn.MaxPool2d(2, 2)
+        self.adaptive_pool = nn.AdaptiveAvgPool2d((4, 4))
+
+        # Dropout is a no-op at inference time, so it is left out
+        self.fc1 = detector.fc1
+        self.relu1 = nn.ReLU()
+        self.fc2 = detector.fc2
+        self.relu2 = nn.ReLU()
+        self.fc3 = detector.fc3
+        self.dequant = torch.ao.quantization.DeQuantStub()
+
+        if channels_last:
+            self.to(memory_format=torch.channels_last)
+        # The fresh ReLUs must share the copied layers' eval mode or fusion refuses to run
+        self.eval()
+
+    def fuse(self):
+        """Fold BatchNorm into the convolutions and fuse ReLUs (eval mode only)"""
+        for block in (self.block1, self.block2, self.block3, self.block4):
+            torch.ao.quantization.fuse_modules(block, [['0', '1', '2']], inplace=True)
+        torch.ao.quantization.fuse_modules(self, [['fc1', 'relu1'], ['fc2', 'relu2']], inplace=True)
+        return self
+
+    def forward(self, x):
+        if self.channels_last:
+            x = x.contiguous(memory_format=torch.channels_last)
+        x = self.quant(x)
+        x = self.pool(self.block1(x))
+        x = self.pool(self.block2(x))
+        x = self.pool(self.block3(x))
+        x = self.pool(self.block4(x))
+
+        x = self.adaptive_pool(x)
+        x = torch.flatten(x, 1)
+
+        x = self.relu1(self.fc1(x))
+        x = self.relu2(self.fc2(x))
+        x = self.dequant(self.fc3(x))
+
+        return F.softmax(x, dim=1)
+
+def _quantization_engine():
+    for engine in ('x86', 'fbgemm', 'qnnpack'):
+        if engine in torch.backends.quantized.supported_engines:
+            return engine
+    return torch.backends.quantized.engine
+
+def build_inference_model(detector, mode='fused', calibration_batches=None, channels_last=True, compiler=None):
+    """Export an optimized copy of a trained detector for CPU inference
+
+    mode is one of INFERENCE_MODES; 'static_int8' needs calibration_batches
+    (an iterable of preprocessed input tensors). compiler may be
+    'torchscript' or 'compile' to additionally trace/freeze or torch.compile
+    the result.
+    """
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f"Unknown inference mode: {mode}")
+
+    example = torch.randn(1, 3, 224, 224)
+    if mode == 'fp32':
+        model = copy.deepcopy(detector).eval()
+        if channels_last:
+            model = model.to(memory_format=torch.channels_last)
+    else:
+        model = QuantizableDeepfakeDetector(detector, channels_last).fuse()
+
+    if mode == 'dynamic_int8':
+        model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    elif mode == 'static_int8':
+        if calibration_batches is None:
+            raise ValueError("static_int8 needs calibration_batches")
+        engine = _quantization_engine()
+        torch.backends.quantized.engine = engine
+        model.qconfig = torch.ao.quantization.get_default_qconfig(engine)
+        torch.ao.quantization.prepare(model, inplace=True)
+        with torch.no_grad():
+            for batch in calibration_batches:
+                model(batch)
+        torch.ao.quantization.convert(model, inplace=True)
+
+    if compiler == 'torchscript':
+        with torch.no_grad():
+            model = torch.jit.freeze(torch.jit.trace(model, example))
+    elif compiler == 'compile':
+        model = torch.compile(model)
+
+    return model
+
+def compare_inference_models(reference, candidate, batches, repeats=3):
+    """Accuracy delta and speed of an optimized model against the fp32 reference"""
+    def timed(model, batch):
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            with torch.no_grad():
+                outputs = model(batch)
+            best = min(best, time.perf_counter() - start)
+        return outputs, best
+
+    deltas = []
+    agreements = 0
+    samples = 0
+    reference_seconds = candidate_seconds = 0.0
+    for batch in batches:
+        reference_outputs, reference_time = timed(reference, batch)
+        candidate_outputs, candidate_time = timed(candidate, batch)
+        reference_seconds += reference_time
+        candidate_seconds += candidate_time
+
+        deltas.append((reference_outputs - candidate_outputs).abs()[:, 1])
+        agreements += (reference_outputs.argmax(dim=1) == candidate_outputs.argmax(dim=1)).sum().item()
+        samples += batch.size(0)
+
+    deltas = torch.cat(deltas)
+    return {
+        'samples': samples,
+        'prediction_agreement': agreements / samples,
+        'mean_fake_probability_delta': deltas.mean().item(),
+        'max_fake_probability_delta': deltas.max().item(),
+        'reference_ms_per_image': 1000 * reference_seconds / samples,
+        'candidate_ms_per_image': 1000 * candidate_seconds / samples,
+        'speedup': reference_seconds / candidate_seconds if candidate_seconds else 0
+    }
+
+def state_dict_layout(state_dict):
+    """Return [(name, shape, dtype, offset, numel), ...] and the total element count"""
+    layout = []
+    offset = 0
+    for name, tensor in state_dict.items():
+        layout.append((name, tensor.shape, tensor.dtype, offset, tensor.numel()))
+        offset += tensor.numel()
+    return layout, offset
+
+def flatten_state_dict(state_dict, layout, num_elements):
+    """Flatten a state dict into one float64 vector following a layout"""
+    flat = torch.empty(num_elements, dtype=torch.float64)
+    for name, _, _, offset, numel in layout:
+        flat[offset:offset + numel] = state_dict[name].reshape(-1)
+    return flat
+
+def unflatten_state_dict(flat, layout):
+    """Rebuild a state dict from a flat vector, rounding integer buffers"""
+    state_dict = {}
+    for name, shape, dtype, offset, numel in layout:
+        values = flat[offset:offset + numel].view(shape)
+        if not dtype.is_floating_point:
+            # e.g. BatchNorm num_batches_tracked
+            values = values.round()
+        state_dict[name] = values.to(dtype)
+    return state_dict
+
+class UpdateCompressor:
+    """Client-side encoder for compact federated updates
+
+    An update is sent as the delta from the global weights, reduced to its
+    top-k largest entries and quantized to int8 with one scale per message.
+    What gets dropped or rounded away is carried into the client's next
+    update (error feedback), so it is delayed rather than lost.
+
+    Wire format: header (magic, flags, base round, element count, k, scale),
+    zlib-compressed uint32 gaps between sorted indices, then the values.
+    """
+
+    MAGIC = b'DFU1'
+    HEADER = struct.Struct('<4sBIIIf')
+    FLAG_INT8 = 1
+    FLAG_DENSE = 2
+
+    def __init__(self, reference_state_dict, topk_ratio=0.01, quantize=True, error_feedback=True):
+        self.layout, self.num_elements = state_dict_layout(reference_state_dict)
+        self.topk_ratio = topk_ratio
+        self.quantize = quantize
+        self.error_feedback = error_feedback
+        self.residual = torch.zeros(self.num_elements, dtype=torch.float64)
+
+    def encode(self, state_dict, global_state_dict, base_round=0):
+        """Encode a trained state dict relative to the global weights it started from"""
+        delta = (flatten_state_dict(state_dict, self.layout, self.num_elements)
+                 - flatten_state_dict(global_state_dict, self.layout, self.num_elements))
+        if self.error_feedback:
+            delta += self.residual
+
+        k = max(1, int(self.num_elements * self.topk_ratio))
+        flags = 0
+        if k >= self.num_elements:
+            flags |= self.FLAG_DENSE
+            k = self.num_elements
+            indices = torch.arange(self.num_elements)
+        else:
+            indices = torch.topk(delta.abs(), k, sorted=False).indices.sort().values
+        values = delta[indices]
+
+        scale = 1.0
+        if self.quantize:
+            flags |= self.FLAG_INT8
+            scale = max(values.abs().max().item() / 127, 1e-12)
+            quantized = (values / scale).round().clamp(-127, 127)
+            sent_values = quantized * scale
+            value_bytes = quantized.to(torch.int8).numpy().tobytes()
+        else:
+            sent_values = values.float().double()
+            value_bytes = values.float().numpy().tobytes()
+
+        if self.error_feedback:
+            self.residual = delta
+            self.residual[indices] -= sent_values
+
+        index_bytes = b''
+        if not flags & self.FLAG_DENSE:
+            gaps = np.diff(indices.numpy(), prepend=0).astype('<u4')
+            index_bytes = zlib.compress(gaps.tobytes())
+
+        header = self.HEADER.pack(self.MAGIC, flags, base_round, self.num_elements, k, scale)
+        return header + struct.pack('<I', len(index_bytes)) + index_bytes + value_bytes
+
+def decode_client_update(payload):
+    """Decode an UpdateCompressor message into (base_round, num_elements, indices, delta values)
+
+    Raises ValueError for anything that is not a well-formed message: a bad
+    magic, k larger than the element count, indices out of range or not
+    strictly increasing, or a payload whose length doesn't match k.
+    """
+    header = UpdateCompressor.HEADER
+    if len(payload) < header.size + 4:
+        raise ValueError("Compressed client update is truncated")
+    magic, flags, base_round, num_elements, k, scale = header.unpack_from(payload, 0)
+    if magic != UpdateCompressor.MAGIC:
+        raise ValueError("Not a compressed client update")
+    if k > num_elements or (flags & UpdateCompressor.FLAG_DENSE and k != num_elements):
+        raise ValueError(f"Compressed update sends {k} values for {num_elements} elements")
+
+    offset = header.size
+    (index_length,) = struct.unpack_from('<I', payload, offset)
+    offset += 4
+    if offset + index_length > len(payload):
+        raise ValueError("Compressed client update is truncated")
+    if flags & UpdateCompressor.FLAG_DENSE:
+        indices = torch.arange(num_elements)
+    else:
+        try:
+            gaps = np.frombuffer(zlib.decompress(payload[offset:offset + index_length]), dtype='<u4')
+        except (zlib.error, ValueError) as e:
+            raise ValueError(f"Corrupt index section in compressed update: {e}") from None
+        if len(gaps) != k:
+            raise ValueError(f"Compressed update has {len(gaps)} indices for {k} values")
+        if k > 1 and not gaps[1:].all():
+            raise ValueError("Compressed update indices are not strictly increasing")
+        indices = np.cumsum(gaps, dtype=np.int64)
+        if k and indices[-1] >= num_elements:
+            raise ValueError(f"Compressed update index {indices[-1]} is out of range for {num_elements} elements")
+        indices = torch.from_numpy(indices)
+    offset += index_length
+
+    value_type = np.int8 if flags & UpdateCompressor.FLAG_INT8 else np.dtype('<f4')
+    if len(payload) - offset != k * np.dtype(value_type).itemsize:
+        raise ValueError("Compressed update value section does not match its length")
+    values = torch.from_numpy(np.frombuffer(payload, dtype=value_type, count=k, offset=offset).astype(np.float64))
+    if flags & UpdateCompressor.FLAG_INT8:
+        values *= scale
+    return base_round, num_elements, indices, values
+
 class FederatedLearning:
-    """Simplified federated learning for privacy-preserving model updates"""
+    """Simplified federated learning for privacy-preserving model updates
+
+    Client updates are folded into a running weighted sum over one flat
+    float64 tensor as they arrive, so memory stays at O(model size) no
+    matter how many clients report in a round. Updates may be full state
+    dicts or compressed delta messages from UpdateCompressor.
+
+    In 'async' mode (FedBuff-style) there is no round barrier: updates are
+    tagged with the round they were trained from, down-weighted by
+    (1 + staleness) ** -staleness_exponent, buffered, and applied to the
+    global model every buffer_size updates while it keeps serving.
+    """
+
+    def __init__(self, model, mode='sync', buffer_size=10, server_lr=1.0, staleness_exponent=0.5, max_staleness=8):
+        if mode not in ('sync', 'async'):
+            raise ValueError(f"Unknown federated learning mode: {mode}")
 
-    def __init__(self, model):
         self.global_model = model
         self.client_updates = []
         self.round_number = 0
+        self._lock = threading.Lock()
+
+        self.mode = mode
+        self.buffer_size = buffer_size
+        self.server_lr = server_lr
+        self.staleness_exponent = staleness_exponent
+        self.max_staleness = max_staleness
+        self.rejected_updates = 0
+
+        # (name, shape, dtype, offset, numel) for every entry of the state dict
+        self.layout, self.num_elements = state_dict_layout(model.state_dict())
+
+        self._weighted_sum = None
+        self._total_data_size = 0
+        # Data size of delta updates, whose global-weight term is added once at aggregation
+        self._delta_data_size = 0
+
+        # Recent global weights, so async full-state updates can be turned into deltas
+        self._snapshots = OrderedDict()
+        if mode == 'async':
+            self._snapshot_global()
+
+    def flatten_state_dict(self, state_dict):
+        """Flatten a state dict into one float64 vector following self.layout"""
+        return flatten_state_dict(state_dict, self.layout, self.num_elements)
+
+    def unflatten_state_dict(self, flat):
+        """Rebuild a state dict from a flat vector, rounding integer buffers"""
+        return unflatten_state_dict(flat, self.layout)
+
+    def _snapshot_global(self):
+        self._snapshots[self.round_number] = self.flatten_state_dict(self.global_model.state_dict()).float()
+        while len(self._snapshots) > self.max_staleness + 1:
+            self._snapshots.popitem(last=False)
+
+    def resnapshot(self):
+        """Re-baseline async deltas after the global weights were replaced outside a round
+
+        Snapshots of the weights before loading a checkpoint or retraining
+        would turn every later full-state update into (new - old) + its delta.
+        """
+        if self.mode != 'async':
+            return
+        with self._lock:
+            self._snapshots.clear()
+            self._snapshot_global()
+
+    def global_state(self):
+        """Return (round_number, state_dict copy) for a client to start training from"""
+        with self._lock:
+            return self.round_number, copy.deepcopy(self.global_model.state_dict())
+
+    def add_client_update(self, model_state_dict, data_size, base_round=None):
+        """Add a client's model update (a state dict or compressed update bytes)"""
+        if data_size <= 0:
+            # Aggregation divides by the summed data sizes
+            raise ValueError(f"Client data_size must be positive, got {data_size}")
+        if self.mode == 'async':
+            return self._add_async_update(model_state_dict, data_size, base_round)
+
+        compressed = isinstance(model_state_dict, (bytes, bytearray, memoryview))
+        if compressed:
+            base_round, num_elements, indices, values = decode_client_update(model_state_dict)
+            if num_elements != self.num_elements:
+                raise ValueError("Compressed update does not match the global model")
+            if base_round != self.round_number:
+                raise ValueError(f"Update was trained from round {base_round}, current round is {self.round_number}")
+        else:
+            missing = [name for name, *_ in self.layout if name not in model_state_dict]
+            if missing:
+                raise ValueError(f"Client update is missing parameters: {missing}")
+
+        with self._lock:
+            if self._weighted_sum is None:
+                self._weighted_sum = torch.zeros(self.num_elements, dtype=torch.float64)
+
+            if compressed:
+                # Only the k sent entries are touched here
+                self._weighted_sum.index_add_(0, indices, values * data_size)
+                self._delta_data_size += data_size
+            else:
+                for name, _, _, offset, numel in self.layout:
+                    self._weighted_sum[offset:offset + numel].add_(model_state_dict[name].reshape(-1), alpha=data_size)
+            self._total_data_size += data_size
+
+            self.client_updates.append({
+                'data_size': data_size,
+                'compressed': compressed,
+                'timestamp': time.time()
+            })
+
+    def _add_async_update(self, update, data_size, base_round):
+        """Buffer a staleness-weighted delta, applying the buffer once it is full"""
+        compressed = isinstance(update, (bytes, bytearray, memoryview))
+        if compressed:
+            base_round, num_elements, indices, values = decode_client_update(update)
+            if num_elements != self.num_elements:
+                raise ValueError("Compressed update does not match the global model")
+
+        with self._lock:
+            if base_round is None:
+                base_round = self.round_number
+            staleness = self.round_number - base_round
+            if staleness < 0 or staleness > self.max_staleness or (not compressed and base_round not in self._snapshots):
+                self.rejected_updates += 1
+                return False
+
+            if self._weighted_sum is None:
+                self._weighted_sum = torch.zeros(self.num_elements, dtype=torch.float64)
+
+            weight = data_size * (1 + staleness) ** -self.staleness_exponent
+            if compressed:
+                self._weighted_sum.index_add_(0, indices, values * weight)
+            else:
+                delta = self.flatten_state_dict(update) - self._snapshots[base_round]
+                self._weighted_sum.add_(delta, alpha=weight)
+            self._total_data_size += data_size
+
+            self.client_updates.append({
+                'data_size': data_size,
+                'compressed': compressed,
+                'staleness': staleness,
+                'timestamp': time.time()
+            })
+
+            if len(self.client_updates) >= self.buffer_size:
+                self._apply_async_buffer()
+            return True
 
-    def add_client_update(self, model_state_dict, data_size):
-        """Add a client's model update"""
-        self.client_updates.append({
-            'state_dict': model_state_dict,
-            'data_size': data_size,
-            'timestamp': time.time()
-        })
+    def _apply_async_buffer(self):
+        # Normalising by data size only keeps the staleness discount in effect
+        global_flat = self.flatten_state_dict(self.global_model.state_dict())
+        global_flat.add_(self._weighted_sum, alpha=self.server_lr / self._total_data_size)
+
+        # In-place parameter copies; inference keeps running against the same modules
+        with torch.no_grad():
+            self.global_model.load_state_dict(self.unflatten_state_dict(global_flat))
+
+        client_count = len(self.client_updates)
+        self.client_updates = []
+        self._weighted_sum = None
+        self._total_data_size = 0
+        self.round_number += 1
+        self._snapshot_global()
+
+        return f"Federated learning round {self.round_number} completed with {client_count} clients"
 
     def aggregate_updates(self):
         """Aggregate client updates using weighted averaging"""
-        if not self.client_updates:
+        with self._lock:
+            if not self.client_updates:
+                return
+
+            if self.mode == 'async':
+                # Apply a partially filled buffer
+                return self._apply_async_buffer()
+
+            if self._delta_data_size:
+                # Delta updates are relative to the current global weights
+                global_flat = self.flatten_state_dict(self.global_model.state_dict())
+                self._weighted_sum.add_(global_flat, alpha=self._delta_data_size)
+
+            aggregated_params = self.unflatten_state_dict(self._weighted_sum / self._total_data_size)
+
+            # Update global model
+            self.global_model.load_state_dict(aggregated_params)
+
+            # Clear client updates
+            client_count = len(self.client_updates)
+            self.client_updates = []
+            self._weighted_sum = None
+            self._total_data_size = 0
+            self._delta_data_size = 0
+            self.round_number += 1
+
+            return f"Federated learning round {self.round_number} completed with {client_count} clients"
+
+def _synthetic_shard(client_id, samples, image_size):
+    """Per-client synthetic data in the style of _initialize_model"""
+    generator = torch.Generator().manual_seed(client_id)
+    half = samples // 2
+    real_data = torch.randn(half, 3, image_size, image_size, generator=generator)
+    fake_data = torch.randn(samples - half, 3, image_size, image_size, generator=generator) * 0.8
+    X = torch.cat([real_data, fake_data], dim=0)
+    y = torch.cat([torch.zeros(half), torch.ones(samples - half)], dim=0).long()
+    return X, y
+
+def _train_virtual_client(task):
+    """Train one virtual client from the global weights (runs inside the process pool)"""
+    client_id, base_round, global_state, samples, image_size, local_epochs, topk_ratio = task
+    start = time.perf_counter()
+    torch.set_num_threads(1)
+
+    model = DeepfakeDetector()
+    model.load_state_dict(global_state)
+    X, y = _synthetic_shard(client_id, samples, image_size)
+
+    optimizer = torch.optim.Adam(model.parameters(), lr=0.001)
+    criterion = nn.CrossEntropyLoss()
+    model.train()
+    for epoch in range(local_epochs):
+        optimizer.zero_grad()
+        loss = criterion(model(X), y)
+        loss.backward()
+        optimizer.step()
+
+    update = model.state_dict()
+    if topk_ratio:
+        # Clients are stateless between rounds here, so there is no residual to feed back
+        compressor = UpdateCompressor(global_state, topk_ratio=topk_ratio, error_feedback=False)
+        update = compressor.encode(update, global_state, base_round)
+
+    return client_id, base_round, update, samples, time.perf_counter() - start
+
+def _peak_rss_mb(children=False):
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is KiB on Linux
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    return resource.getrusage(who).ru_maxrss / 1024
+
+class FederatedSimulation:
+    """Drives FederatedLearning with many virtual clients trained in a process pool
+
+    Each round samples clients_per_round clients, trains them on their own
+    synthetic shard starting from the current global weights and streams
+    their updates into add_client_update as they finish. The report gives
+    round wall time, client training time, aggregation time and throughput,
+    payload size and peak memory.
+    """
+
+    def __init__(self, num_clients=100, clients_per_round=20, rounds=3, workers=None, samples_per_client=8,
+                 image_size=64, local_epochs=1, topk_ratio=None, mode='sync', seed=0):
+        self.num_clients = num_clients
+        self.clients_per_round = clients_per_round
+        self.rounds = rounds
+        self.workers = workers or os.cpu_count() or 1
+        self.samples_per_client = samples_per_client
+        self.image_size = image_size
+        self.local_epochs = local_epochs
+        self.topk_ratio = topk_ratio
+        self.random = np.random.default_rng(seed)
+        self.federated_learning = FederatedLearning(DeepfakeDetector(), mode=mode)
+
+    def run(self):
+        fl = self.federated_learning
+        report = {'config': {
+            'num_clients': self.num_clients,
+            'clients_per_round': self.clients_per_round,
+            'workers': self.workers,
+            'samples_per_client': self.samples_per_client,
+            'image_size': self.image_size,
+            'topk_ratio': self.topk_ratio,
+            'mode': fl.mode,
+            'model_parameters': fl.num_elements
+        }, 'rounds': []}
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            for _ in range(self.rounds):
+                round_start = time.perf_counter()
+                base_round, global_state = fl.global_state()
+                clients = self.random.choice(self.num_clients, self.clients_per_round, replace=False)
+                tasks = [
+                    (int(client_id), base_round, global_state, self.samples_per_client,
+                     self.image_size, self.local_epochs, self.topk_ratio)
+                    for client_id in clients
+                ]
+
+                aggregation_seconds = 0.0
+                training_seconds = 0.0
+                payload_bytes = 0
+                for _, client_round, update, data_size, train_seconds in executor.map(_train_virtual_client, tasks):
+                    training_seconds += train_seconds
+                    if isinstance(update, bytes):
+                        payload_bytes += len(update)
+                    else:
+                        payload_bytes += sum(tensor.numel() * tensor.element_size() for tensor in update.values())
+
+                    start = time.perf_counter()
+                    fl.add_client_update(update, data_size, base_round=client_round)
+                    aggregation_seconds += time.perf_counter() - start
+
+                start = time.perf_counter()
+                fl.aggregate_updates()
+                aggregation_seconds += time.perf_counter() - start
+
+                round_seconds = time.perf_counter() - round_start
+                report['rounds'].append({
+                    'round': fl.round_number,
+                    'clients': len(tasks),
+                    'round_seconds': round_seconds,
+                    'client_training_seconds': training_seconds,
+                    'aggregation_seconds': aggregation_seconds,
+                    'updates_per_second': len(tasks) / aggregation_seconds if aggregation_seconds else 0,
+                    'payload_mb': payload_bytes / 1e6,
+                    'aggregation_mb_per_second': payload_bytes / 1e6 / aggregation_seconds if aggregation_seconds else 0
+                })
+
+        report['peak_rss_mb'] = {'server': _peak_rss_mb(), 'clients': _peak_rss_mb(children=True)}
+        report['rejected_updates'] = fl.rejected_updates
+        return report
+
+class ImagePreprocessor:
+    """Resize + normalize images straight from uint8 arrays into a reusable batch buffer"""
+
+    def __init__(self, size=224, mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225)):
+        self.size = size
+        # Normalize((x / 255 - mean) / std) folded into one multiply-add per pixel
+        self.scale = (1.0 / (255.0 * np.array(std, dtype=np.float32))).reshape(3, 1, 1)
+        self.offset = (-np.array(mean, dtype=np.float32) / np.array(std, dtype=np.float32)).reshape(3, 1, 1)
+
+        # PIL inputs keep the torchvision path, built once instead of per call
+        self.transform = transforms.Compose([
+            transforms.Resize((size, size)),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=list(mean), std=list(std))
+        ])
+
+        # One buffer per thread so concurrent callers never share output memory
+        self._local = threading.local()
+
+    def _buffer(self, batch_size):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None or buffer.shape[0] < batch_size:
+            buffer = np.empty((batch_size, 3, self.size, self.size), dtype=np.float32)
+            self._local.buffer = buffer
+        return buffer
+
+    def to_rgb_array(self, image):
+        """Return an HxWx3 uint8 RGB array for numpy or PIL input"""
+        if isinstance(image, Image.Image):
+            return np.asarray(image.convert('RGB'))
+        if image.dtype != np.uint8:
+            image = np.clip(image, 0, 255).astype(np.uint8)
+        if image.ndim == 2:
+            return cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
+        if image.shape[2] == 4:
+            return image[:, :, :3]
+        return image
+
+    def preprocess_batch(self, images):
+        """Preprocess images into an (N, 3, size, size) tensor
+
+        The tensor is a view of this thread's reusable buffer, so it is only
+        valid until the next call from the same thread.
+        """
+        buffer = self._buffer(len(images))
+        for i, image in enumerate(images):
+            if isinstance(image, Image.Image):
+                buffer[i] = self.transform(image.convert('RGB')).numpy()
+                continue
+
+            image = self.to_rgb_array(image)
+            height, width = image.shape[:2]
+            # Area interpolation when shrinking avoids aliasing, like Resize's antialiasing
+            interpolation = cv2.INTER_AREA if height > self.size or width > self.size else cv2.INTER_LINEAR
+            resized = cv2.resize(image, (self.size, self.size), interpolation=interpolation)
+
+            np.multiply(resized.transpose(2, 0, 1), self.scale, out=buffer[i])
+            buffer[i] += self.offset
+
+        return torch.from_numpy(buffer[:len(images)])
+
+class HeuristicAnalyzer:
+    """Blur, edge and frequency heuristics computed for a stack of downscaled images
+
+    Each side longer than analysis_size is shrunk to it, and images that end
+    up as analysis_size squares are scored together as one stack. Shorter
+    sides are never upscaled, since upscaling smooths away the detail the
+    blur and frequency terms measure; such images are scored one at a time.
+    """
+
+    def __init__(self, analysis_size=224):
+        self.analysis_size = analysis_size
+        self._local = threading.local()
+
+    def _buffer(self, batch_size):
+        # Grayscale stack with a one-pixel border for the Laplacian stencil
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None or buffer.shape[0] < batch_size:
+            size = self.analysis_size + 2
+            buffer = np.empty((batch_size, size, size), dtype=np.float32)
+            self._local.buffer = buffer
+        return buffer[:batch_size]
+
+    def analyze_batch(self, images):
+        """Return one heuristic score per image (lower scores suggest more likely to be fake)"""
+        size = self.analysis_size
+        grays = []
+        for image in images:
+            if isinstance(image, Image.Image):
+                image = np.array(image)
+            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+            height, width = gray.shape
+            if height > size or width > size:
+                gray = cv2.resize(gray, (min(width, size), min(height, size)), interpolation=cv2.INTER_AREA)
+            grays.append(gray)
+
+        scores = np.empty(len(images), dtype=np.float64)
+        stacked = [i for i, gray in enumerate(grays) if gray.shape == (size, size)]
+        if stacked:
+            padded = self._buffer(len(stacked))
+            for row, i in enumerate(stacked):
+                padded[row, 1:-1, 1:-1] = grays[i]
+            scores[stacked] = self._score_stack(padded, [grays[i] for i in stacked])
+        for i, gray in enumerate(grays):
+            if gray.shape != (size, size):
+                padded = np.empty((1, gray.shape[0] + 2, gray.shape[1] + 2), dtype=np.float32)
+                padded[0, 1:-1, 1:-1] = gray
+                scores[i] = self._score_stack(padded, [gray])[0]
+        return scores
+
+    @staticmethod
+    def _score_stack(padded, grays):
+        """Score a stack of equally sized grayscale images held inside a one-pixel border"""
+        count = len(grays)
+        # Canny has no batched form, but at analysis_size it is cheap
+        edge_density = np.array([np.count_nonzero(cv2.Canny(gray, 50, 150)) / gray.size for gray in grays])
+
+        # Reflect-101 border, matching cv2.Laplacian's default
+        padded[:, 0, :] = padded[:, 2, :]
+        padded[:, -1, :] = padded[:, -3, :]
+        padded[:, :, 0] = padded[:, :, 2]
+        padded[:, :, -1] = padded[:, :, -3]
+        gray_stack = padded[:, 1:-1, 1:-1]
+
+        # 1. Blurriness analysis (3x3 Laplacian over the whole stack)
+        laplacian = (padded[:, :-2, 1:-1] + padded[:, 2:, 1:-1] + padded[:, 1:-1, :-2] + padded[:, 1:-1, 2:]
+                     - 4 * gray_stack)
+        blur_score = np.minimum(laplacian.reshape(count, -1).var(axis=1, dtype=np.float64) / 1000, 1.0)
+
+        # 3. Frequency analysis on the real-input half spectrum (numpy caches the FFT plan per size).
+        # Weighting each column by how often it appears in the full spectrum gives the full-spectrum std.
+        width = gray_stack.shape[2]
+        magnitude_spectrum = np.log(np.abs(np.fft.rfft2(gray_stack)) + 1).reshape(count, -1, width // 2 + 1)
+        weights = np.full(width // 2 + 1, 2.0)
+        weights[0] = 1.0
+        if width % 2 == 0:
+            weights[-1] = 1.0
+        column_weights = weights / (weights.sum() * magnitude_spectrum.shape[1])
+        mean = (magnitude_spectrum * column_weights).sum(axis=(1, 2))
+        variance = (np.square(magnitude_spectrum - mean[:, None, None]) * column_weights).sum(axis=(1, 2))
+        freq_score = np.minimum(np.sqrt(variance) / 10, 1.0)
+
+        return (blur_score + edge_density + freq_score) / 3
+
+    def select_tiles(self, image, tile_size, max_tiles, scales=(1, 2), cell_size=32):
+        """Pick up to max_tiles (y, x, side, score) crops of an RGB array with the most detail
+
+        Candidates lie on a non-overlapping grid per scale (side = tile_size * scale)
+        and are ranked by the Laplacian variance and edge density that
+        analyze_batch uses, measured on a thumbnail where each tile_size
+        region spans cell_size pixels.
+        """
+        height, width = image.shape[:2]
+        factor = cell_size / tile_size
+        thumbnail = cv2.resize(image, (max(1, int(width * factor)), max(1, int(height * factor))),
+                               interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(thumbnail, cv2.COLOR_RGB2GRAY)
+        laplacian = cv2.Laplacian(gray, cv2.CV_32F)
+        edges = cv2.Canny(gray, 50, 150)
+
+        candidates = []
+        for scale in scales:
+            side, cell = tile_size * scale, cell_size * scale
+            rows = min(height // side, gray.shape[0] // cell)
+            cols = min(width // side, gray.shape[1] // cell)
+            # A tile covering the whole image adds nothing over the resized view
+            if rows == 0 or cols == 0 or max(height, width) <= side:
+                continue
+
+            detail = laplacian[:rows * cell, :cols * cell].reshape(rows, cell, cols, cell).var(axis=(1, 3))
+            density = np.count_nonzero(
+                edges[:rows * cell, :cols * cell].reshape(rows, cell, cols, cell), axis=(1, 3)
+            ) / (cell * cell)
+            scores = np.minimum(detail / 1000, 1.0) + density
+
+            for index in np.argsort(scores, axis=None)[::-1][:max_tiles]:
+                row, col = divmod(int(index), cols)
+                candidates.append((float(scores[row, col]), row * side, col * side, side))
+
+        candidates.sort(reverse=True)
+        return [(y, x, side, score) for score, y, x, side in candidates[:max_tiles]]
+
+class DetectionCascade:
+    """Early-exit thresholds on the heuristic score in front of the CNN, with per-stage counts
+
+    Images scoring at least real_threshold exit as real and images scoring at
+    most fake_threshold exit as fake (heuristic scores are lower for likely
+    fakes); either threshold may be None to disable that exit. When
+    escalate_margin is set, model verdicts whose fake probability lies
+    within escalate_margin of 0.5 are re-scored with tiled inference.
+    """
+
+    STAGES = ('heuristic', 'model', 'tiled')
+
+    def __init__(self, real_threshold=None, fake_threshold=None, escalate_margin=None):
+        self.real_threshold = real_threshold
+        self.fake_threshold = fake_threshold
+        self.escalate_margin = escalate_margin
+        self.entered = dict.fromkeys(self.STAGES, 0)
+        self.exited = dict.fromkeys(self.STAGES, 0)
+        self._lock = threading.Lock()
+
+    @property
+    def key(self):
+        """Identifies the thresholds for cache keys"""
+        return f"cascade{self.real_threshold}:{self.fake_threshold}:{self.escalate_margin}"
+
+    def gate(self, heuristic_score):
+        """Return 'real' or 'fake' for confidently clear scores, None when the CNN should decide"""
+        if self.real_threshold is not None and heuristic_score >= self.real_threshold:
+            return 'real'
+        if self.fake_threshold is not None and heuristic_score <= self.fake_threshold:
+            return 'fake'
+        return None
+
+    def exit_confidence(self, verdict, heuristic_score):
+        """Confidence in a gate verdict, rising from 0.5 at its threshold to 1 at the end of the score range"""
+        if verdict == 'real':
+            span = 1 - self.real_threshold
+            distance = heuristic_score - self.real_threshold
+        else:
+            span = self.fake_threshold
+            distance = self.fake_threshold - heuristic_score
+        return 0.5 + 0.5 * min(1.0, distance / span) if span > 0 else 1.0
+
+    def should_escalate(self, fake_probability):
+        return self.escalate_margin is not None and abs(fake_probability - 0.5) <= self.escalate_margin
+
+    def record(self, stage, entered, exited):
+        with self._lock:
+            self.entered[stage] += entered
+            self.exited[stage] += exited
+        metrics.increment(f"cascade_{stage}_entered", entered)
+        metrics.increment(f"cascade_{stage}_exited", exited)
+
+    def take_counts(self):
+        """Return {stage: (entered, exited)} recorded since the last call and reset them"""
+        with self._lock:
+            counts = {stage: (self.entered[stage], self.exited[stage])
+                      for stage in self.STAGES if self.entered[stage]}
+            self.entered = dict.fromkeys(self.STAGES, 0)
+            self.exited = dict.fromkeys(self.STAGES, 0)
+        return counts
+
+    def report(self):
+        """Per-stage counts with the share of images exiting at and passing through each stage"""
+        with self._lock:
+            entered, exited = dict(self.entered), dict(self.exited)
+        return {
+            stage: {
+                'entered': entered[stage],
+                'exited': exited[stage],
+                'exit_rate': exited[stage] / entered[stage] if entered[stage] else 0,
+                'pass_through_rate': 1 - exited[stage] / entered[stage] if entered[stage] else 0
+            }
+            for stage in self.STAGES
+        }
+
+    def thresholds(self):
+        return {
+            'real_threshold': self.real_threshold,
+            'fake_threshold': self.fake_threshold,
+            'escalate_margin': self.escalate_margin
+        }
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.thresholds(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(**json.load(f))
+
+    @staticmethod
+    def _exit_threshold(scores, wrong, max_error):
+        """Loosest threshold over sorted scores whose exits have an error rate within max_error"""
+        if len(scores) == 0:
+            return None
+        error_rate = np.cumsum(wrong) / np.arange(1, len(scores) + 1)
+        # Only cut between distinct scores, since a threshold admits every tied score
+        boundary = np.append(scores[1:] != scores[:-1], True)
+        valid = np.flatnonzero((error_rate <= max_error) & boundary)
+        return float(scores[valid[-1]]) if len(valid) else None
+
+    @classmethod
+    def calibrate(cls, heuristic_scores, labels, max_error=0.02, fake_probabilities=None):
+        """Fit thresholds on a labeled set (labels: 1 for fake, 0 for real)
+
+        Each exit threshold admits as many images as possible while keeping
+        the share of mislabeled images among its exits within max_error.
+        With fake_probabilities from the CNN, escalate_margin is the
+        smallest margin whose confident model verdicts meet the same bound.
+        """
+        scores = np.asarray(heuristic_scores, dtype=np.float64)
+        labels = np.asarray(labels, dtype=np.int64)
+
+        descending = np.argsort(-scores, kind='stable')
+        real_threshold = cls._exit_threshold(scores[descending], labels[descending] == 1, max_error)
+        ascending = np.argsort(scores, kind='stable')
+        fake_threshold = cls._exit_threshold(scores[ascending], labels[ascending] == 0, max_error)
+
+        escalate_margin = None
+        if fake_probabilities is not None:
+            probabilities = np.asarray(fake_probabilities, dtype=np.float64)
+            margins = np.abs(probabilities - 0.5)
+            wrong = (probabilities > 0.5).astype(np.int64) != labels
+            order = np.argsort(-margins, kind='stable')
+            confident_margin = cls._exit_threshold(margins[order], wrong[order], max_error)
+            # Everything at or below the loosest confident margin goes on to tiles
+            escalate_margin = 0.5 if confident_margin is None else float(
+                margins[margins < confident_margin].max(initial=0.0)
+            )
+
+        return cls(real_threshold, fake_threshold, escalate_margin)
+
+class DetectionEngine:
+    """Preprocessing, model forward pass and heuristics for batches of images
+
+    With max_tiles > 0 each image is also scored on up to max_tiles
+    full-resolution crops of its most detailed regions, which go through the
+    same forward pass as the resized whole image. That bounds the extra
+    compute to max_tiles model inputs per image however large the upload is.
+
+    With a DetectionCascade the downscaled heuristics run first and decide
+    confidently clear images on their own; only the rest reach the CNN, and
+    with max_tiles only ambiguous model verdicts are re-scored on tiles.
+    """
+
+    def __init__(self, detector, preprocessor=None, heuristics=None, max_tiles=0, tile_scales=(1, 2),
+                 cascade=None):
+        self.detector = detector
+        self.preprocessor = preprocessor or ImagePreprocessor()
+        self.heuristics = heuristics or HeuristicAnalyzer()
+        self.max_tiles = max_tiles
+        self.tile_scales = tile_scales
+        self.cascade = cascade
+
+    def tile_views(self, images):
+        """Expand images into [whole image, *tiles] model inputs plus the tiles chosen per image"""
+        views, tiles = [], []
+        for image in images:
+            image = self.preprocessor.to_rgb_array(image)
+            selected = self.heuristics.select_tiles(image, self.preprocessor.size, self.max_tiles, self.tile_scales)
+            views.append(image)
+            views.extend(image[y:y + side, x:x + side] for y, x, side, _ in selected)
+            tiles.append(selected)
+        return views, tiles
+
+    def aggregate_tiles(self, outputs, tiles):
+        """Average each image's whole-view probabilities with its detail-weighted tile probabilities"""
+        aggregated, summaries = [], []
+        offset = 0
+        for selected in tiles:
+            whole = outputs[offset]
+            tile_outputs = outputs[offset + 1:offset + 1 + len(selected)]
+            offset += 1 + len(selected)
+
+            if not selected:
+                aggregated.append(whole)
+                summaries.append({'count': 0})
+                continue
+
+            weights = torch.tensor([score for *_, score in selected], dtype=tile_outputs.dtype)
+            weights = weights / weights.sum() if weights.sum() > 0 else torch.full_like(weights, 1 / len(selected))
+            aggregated.append((whole + weights @ tile_outputs) / 2)
+            summaries.append({
+                'count': len(selected),
+                'max_fake': tile_outputs[:, 1].max().item(),
+                'boxes': [
+                    {'x': x, 'y': y, 'size': side, 'fake': probabilities[1].item()}
+                    for (y, x, side, _), probabilities in zip(selected, tile_outputs)
+                ]
+            })
+        return torch.stack(aggregated), summaries
+
+    def detect_batch(self, images):
+        """Detect deepfakes for a list of images with one stacked forward pass"""
+        # Heuristics run on small downscaled copies, so they go first and can gate the CNN
+        with metrics.span('heuristics'):
+            heuristic_scores = self.heuristic_scores(images)
+
+        if self.cascade is None:
+            return self.model_results(images, heuristic_scores, tiled=bool(self.max_tiles))
+        return self.cascade_results(images, heuristic_scores)
+
+    def cascade_results(self, images, heuristic_scores):
+        """Exit confidently clear images on heuristics and send the rest through the model stages"""
+        cascade = self.cascade
+        results = [None] * len(images)
+        remaining = []
+        for i, heuristic_score in enumerate(heuristic_scores):
+            # A failed analysis says nothing about the image, so it never exits early
+            verdict = cascade.gate(heuristic_score) if heuristic_score is not None else None
+            if verdict is None:
+                remaining.append(i)
+            else:
+                results[i] = self.heuristic_result(verdict, heuristic_score)
+        cascade.record('heuristic', len(images), len(images) - len(remaining))
+        if not remaining:
+            return results
+
+        escalate = bool(self.max_tiles) and cascade.escalate_margin is not None
+        ambiguous = []
+        model_results = self.model_results([images[i] for i in remaining],
+                                           [heuristic_scores[i] for i in remaining], tiled=False)
+        for i, result in zip(remaining, model_results):
+            result['stage'] = 'model'
+            results[i] = result
+            if escalate and 'error' not in result and cascade.should_escalate(result['probabilities']['fake']):
+                ambiguous.append(i)
+        cascade.record('model', len(remaining), len(remaining) - len(ambiguous))
+
+        if ambiguous:
+            tiled_results = self.model_results([images[i] for i in ambiguous],
+                                               [heuristic_scores[i] for i in ambiguous], tiled=True)
+            for i, result in zip(ambiguous, tiled_results):
+                result['stage'] = 'tiled'
+                results[i] = result
+            cascade.record('tiled', len(ambiguous), len(ambiguous))
+        return results
+
+    def heuristic_result(self, verdict, heuristic_score):
+        """Result for an image decided by the heuristic gate alone"""
+        # The raw score sits on the wrong side of 0.5 whenever a calibrated threshold does,
+        # so probabilities come from the distance past the threshold to agree with the verdict
+        confidence = self.cascade.exit_confidence(verdict, heuristic_score)
+        fake_probability = confidence if verdict == 'fake' else 1 - confidence
+        return {
+            'is_deepfake': verdict == 'fake',
+            'confidence': confidence,
+            'heuristic_score': heuristic_score,
+            'probabilities': {
+                'real': 1 - fake_probability,
+                'fake': fake_probability
+            },
+            'stage': 'heuristic'
+        }
+
+    def model_results(self, images, heuristic_scores, tiled):
+        """Model verdicts, optionally from tiled inference, combined with precomputed heuristic scores"""
+        try:
+            views, tiles = images, None
+            if tiled:
+                with metrics.span('tile_select'):
+                    views, tiles = self.tile_views(images)
+
+            with metrics.span('preprocess'):
+                processed_images = self.preprocessor.preprocess_batch(views)
+
+            with metrics.span('model_forward'), torch.no_grad():
+                outputs = self.detector(processed_images)
+
+            if tiles is not None:
+                outputs, tile_summaries = self.aggregate_tiles(outputs, tiles)
+        except Exception as e:
+            if len(images) > 1:
+                # Retry individually so one bad upload doesn't fail the whole batch
+                return [
+                    self.model_results([image], [heuristic_score], tiled)[0]
+                    for image, heuristic_score in zip(images, heuristic_scores)
+                ]
+            metrics.increment('detection_errors')
+            return [self.detection_error(e)]
+        metrics.increment('images_detected', len(images))
+
+        results = [
+            self.combine(probabilities, heuristic_score)
+            for probabilities, heuristic_score in zip(outputs, heuristic_scores)
+        ]
+        if tiles is not None:
+            for result, summary in zip(results, tile_summaries):
+                if 'error' not in result:
+                    result['tiles'] = summary
+        return results
+
+    def combine(self, probabilities, heuristic_score):
+        """Combine model probabilities for one image with its heuristic score"""
+        try:
+            is_fake = probabilities[1].item() > 0.5
+            confidence = max(probabilities).item()
+
+            # Combine model prediction with heuristics, when they could be computed
+            final_confidence = confidence if heuristic_score is None else (confidence + heuristic_score) / 2
+
+            return {
+                'is_deepfake': is_fake,
+                'confidence': final_confidence,
+                'model_confidence': confidence,
+                'heuristic_score': heuristic_score,
+                'probabilities': {
+                    'real': probabilities[0].item(),
+                    'fake': probabilities[1].item()
+                }
+            }
+        except Exception as e:
+            return self.detection_error(e)
+
+    def detection_error(self, error):
+        return {
+            'is_deepfake': False,
+            'confidence': 0.5,
+            'error': str(error),
+            'probabilities': {'real': 0.5, 'fake': 0.5}
+        }
+
+    def heuristic_scores(self, images):
+        """Heuristic scores for several images in one vectorized pass, None where analysis failed"""
+        try:
+            return [float(score) for score in self.heuristics.analyze_batch(images)]
+        except Exception:
+            if len(images) > 1:
+                # Score individually so one unreadable image doesn't reset the batch
+                return [self.heuristic_scores([image])[0] for image in images]
+            metrics.increment('heuristic_errors')
+            return [None]
+
+class DetectionBatcher:
+    """Coalesces concurrent detection requests into batched forward passes"""
+
+    def __init__(self, detect_batch_fn, max_batch_size=8, max_wait_ms=5):
+        self.detect_batch_fn = detect_batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.requests = queue.Queue()
+        self.batches_processed = 0
+        self.images_processed = 0
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, image):
+        """Queue an image for detection and return a Future for its result"""
+        future = Future()
+        self._ensure_worker()
+        self.requests.put((image, future))
+        return future
+
+    def detect(self, image, timeout=None):
+        """Detect a single image through the shared batching queue"""
+        return self.submit(image).result(timeout)
+
+    def close(self):
+        """Stop the worker thread once queued requests are drained"""
+        with self._lock:
+            if self._worker is not None:
+                self.requests.put(None)
+                self._worker.join()
+                self._worker = None
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='detection-batcher', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+
+            # Collect more requests until the batch is full or the wait window closes
+            batch = [request]
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self.requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop = True
+                    break
+                batch.append(request)
+
+            self._process(batch)
+            if stop:
+                return
+
+    def _process(self, batch):
+        images = [image for image, _ in batch]
+        try:
+            results = self.detect_batch_fn(images)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches_processed += 1
+        self.images_processed += len(batch)
+        metrics.increment('batches')
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+def _inference_worker(detector, task_queue, result_queue, num_threads, max_batch_size, max_tiles=0,
+                      cascade_thresholds=None):
+    """Worker process loop: read images from shared memory, detect in batches, send results back"""
+    torch.set_num_threads(num_threads)
+    detector.eval()
+    cascade = DetectionCascade(**cascade_thresholds) if cascade_thresholds else None
+    engine = DetectionEngine(detector, max_tiles=max_tiles, cascade=cascade)
+    attached = {}
+
+    try:
+        stop = False
+        while not stop:
+            task = task_queue.get()
+            if task is None:
+                break
+
+            # Take whatever else is already queued to fill a batch
+            tasks = [task]
+            while len(tasks) < max_batch_size:
+                try:
+                    task = task_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if task is None:
+                    stop = True
+                    break
+                tasks.append(task)
+
+            images = []
+            for _, slot_name, shape, dtype, payload in tasks:
+                if slot_name is None:
+                    images.append(payload)
+                    continue
+                if slot_name not in attached:
+                    attached[slot_name] = shared_memory.SharedMemory(name=slot_name)
+                images.append(np.ndarray(shape, dtype=dtype, buffer=attached[slot_name].buf))
+
+            results = engine.detect_batch(images)
+            # Drop views into shared memory before the parent reuses their slots
+            del images
+            # Stage counts ride along with the batch's first result so the parent's cascade report covers the pool
+            cascade_counts = cascade.take_counts() if cascade is not None else None
+            for task, result in zip(tasks, results):
+                result_queue.put((task[0], result, cascade_counts))
+                cascade_counts = None
+    finally:
+        for slot in attached.values():
+            slot.close()
+
+class InferenceWorkerPool:
+    """Serves detections from worker processes sharing one copy of the detector weights
+
+    Parameters and buffers live in shared memory, so in-place updates such as
+    load_state_dict after a federated round reach every worker. Images travel
+    through preallocated shared-memory slots instead of being pickled, and
+    each worker gets its own slice of the intra-op thread budget.
+
+    Workers pull from one shared queue, so when a worker dies the requests it
+    held cannot be told apart: every pending future then fails, the pool is
+    marked broken and further submits raise RuntimeError.
+    """
+
+    LIVENESS_INTERVAL = 1.0
+
+    def __init__(self, detector, num_workers=None, threads_per_worker=None, max_batch_size=8,
+                 slots_per_worker=2, slot_bytes=32 * 1024 * 1024, max_tiles=0, cascade=None):
+        cpu_count = os.cpu_count() or 1
+        self.num_workers = num_workers or cpu_count
+        self.threads_per_worker = threads_per_worker or max(1, cpu_count // self.num_workers)
+        self.slot_bytes = slot_bytes
+        # Workers gate with copies of these thresholds and report their stage counts back into it
+        self.cascade = cascade
+        cascade_thresholds = cascade.thresholds() if cascade is not None else None
+
+        detector.share_memory()
+
+        context = torch.multiprocessing.get_context('spawn')
+        self.task_queue = context.Queue()
+        self.result_queue = context.Queue()
+
+        # A request waits for a free slot, which bounds how much work can queue up
+        self.slots = [shared_memory.SharedMemory(create=True, size=slot_bytes)
+                      for _ in range(self.num_workers * slots_per_worker)]
+        self.free_slots = queue.Queue()
+        for slot in self.slots:
+            self.free_slots.put(slot)
+
+        self.pending = {}
+        self.broken = None
+        self._closing = False
+        self._request_ids = itertools.count()
+        self._lock = threading.Lock()
+
+        self.workers = [
+            context.Process(
+                target=_inference_worker,
+                args=(detector, self.task_queue, self.result_queue, self.threads_per_worker, max_batch_size,
+                      max_tiles, cascade_thresholds),
+                daemon=True
+            )
+            for _ in range(self.num_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+        self._collector = threading.Thread(target=self._collect_results, name='inference-results', daemon=True)
+        self._collector.start()
+
+    def submit(self, image, timeout=None):
+        """Send an image to the workers and return a Future for its result
+
+        timeout bounds the wait for a free shared-memory slot.
+        """
+        if self.broken:
+            raise RuntimeError(self.broken)
+        future = Future()
+        request_id = next(self._request_ids)
+        slot = None
+
+        if isinstance(image, np.ndarray) and image.nbytes <= self.slot_bytes:
+            image = np.ascontiguousarray(image)
+            try:
+                slot = self.free_slots.get(timeout=timeout)
+            except queue.Empty:
+                raise TimeoutError("No free inference slot") from None
+            if self.broken:
+                # Slots come back when the pool fails; don't hand them to live workers again
+                raise RuntimeError(self.broken)
+            np.ndarray(image.shape, dtype=image.dtype, buffer=slot.buf)[...] = image
+            task = (request_id, slot.name, image.shape, image.dtype.str, None)
+        else:
+            # PIL images and oversized arrays fall back to pickling
+            task = (request_id, None, None, None, image)
+
+        with self._lock:
+            if self.broken:
+                if slot is not None:
+                    self.free_slots.put(slot)
+                raise RuntimeError(self.broken)
+            self.pending[request_id] = (future, slot)
+        self.task_queue.put(task)
+        return future
+
+    def detect(self, image, timeout=None):
+        return self.submit(image, timeout).result(timeout)
+
+    def detect_batch(self, images, timeout=None):
+        futures = [self.submit(image, timeout) for image in images]
+        return [future.result(timeout) for future in futures]
+
+    def _collect_results(self):
+        while True:
+            try:
+                message = self.result_queue.get(timeout=self.LIVENESS_INTERVAL)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            if message is None:
+                return
+            request_id, result, cascade_counts = message
+            if cascade_counts:
+                for stage, (entered, exited) in cascade_counts.items():
+                    self.cascade.record(stage, entered, exited)
+            with self._lock:
+                entry = self.pending.pop(request_id, None)
+            if entry is None:
+                # Already failed when a worker died
+                continue
+            future, slot = entry
+            if slot is not None:
+                self.free_slots.put(slot)
+            future.set_result(result)
+
+    def _check_workers(self):
+        """Fail every pending request once any worker has exited unexpectedly"""
+        if self._closing or self.broken:
+            return
+        dead = [worker for worker in self.workers if not worker.is_alive()]
+        if not dead:
             return
+        with self._lock:
+            self.broken = f"Inference worker exited with code {dead[0].exitcode}"
+            failed = list(self.pending.values())
+            self.pending.clear()
+        metrics.increment('worker_pool_failures')
+        for future, slot in failed:
+            if slot is not None:
+                self.free_slots.put(slot)
+            future.set_exception(RuntimeError(self.broken))
+
+    def close(self):
+        """Stop the workers and release the shared-memory slots"""
+        self._closing = True
+        for _ in self.workers:
+            self.task_queue.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.result_queue.put(None)
+        self._collector.join()
+
+        for slot in self.slots:
+            slot.close()
+            slot.unlink()
+
+class DetectionCache:
+    """LRU + TTL cache of detection results keyed by content hash and model version"""
+
+    def __init__(self, max_entries=10000, ttl=3600, persist_path=None, persist_every=100):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persist_path = persist_path
+        self.persist_every = persist_every
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._unsaved = 0
+        self._lock = threading.Lock()
+
+        if persist_path and os.path.exists(persist_path):
+            self._load()
+
+    def _key(self, content_hash, model_version):
+        return f"{model_version}:{content_hash}"
+
+    def get(self, content_hash, model_version):
+        """Return the cached result, or None on a miss or expired entry"""
+        key = self._key(content_hash, model_version)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self.entries[key]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, content_hash, model_version, result):
+        key = self._key(content_hash, model_version)
+        with self._lock:
+            self.entries[key] = (time.time(), result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+            self._unsaved += 1
+            if self.persist_path and self._unsaved >= self.persist_every:
+                self._save()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0
+        }
 
-        # Calculate total data size
-        total_data_size = sum(update['data_size'] for update in self.client_updates)
+    def save(self):
+        """Write the cache to persist_path, if configured"""
+        with self._lock:
+            if self.persist_path:
+                self._save()
+
+    def _save(self):
+        # Write to a temporary file first so a crash never leaves a truncated cache
+        temp_path = self.persist_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump([[key, stored_at, result] for key, (stored_at, result) in self.entries.items()], f)
+        os.replace(temp_path, self.persist_path)
+        self._unsaved = 0
+
+    def _load(self):
+        try:
+            with open(self.persist_path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
 
-        # Initialize aggregated parameters
-        aggregated_params = {}
+        now = time.time()
+        for key, stored_at, result in saved[-self.max_entries:]:
+            if now - stored_at <= self.ttl:
+                self.entries[key] = (stored_at, result)
+
+def perceptual_hash(image, method='phash'):
+    """64-bit perceptual hash (DCT-based pHash or gradient dHash) of an RGB image"""
+    if isinstance(image, Image.Image):
+        image = np.asarray(image.convert('RGB'))
+    gray = image if image.ndim == 2 else cv2.cvtColor(image[:, :, :3], cv2.COLOR_RGB2GRAY)
+
+    if method == 'dhash':
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA).astype(np.float32)
+        bits = small[:, 1:] > small[:, :-1]
+    else:
+        small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+        low_freq = cv2.dct(small)[:8, :8]
+        # Median without the DC term, which only tracks overall brightness
+        bits = low_freq > np.median(low_freq.flatten()[1:])
+
+    return int(np.packbits(bits.flatten()).view('>u8')[0])
+
+class PerceptualHashIndex:
+    """Multi-index hashing over 64-bit perceptual hashes for Hamming-radius search
+
+    Each hash is split into `chunks` equal substrings, each with its own
+    bucket table. Any hash within max_distance of a query matches it in at
+    least one chunk to within max_distance // chunks bits, so only those
+    buckets need to be scanned.
+
+    The index holds entries for one model version at a time: adding under a
+    new version drops everything indexed before, and lookups under another
+    version find nothing. Beyond max_entries the oldest entries are evicted.
+    """
 
-        # Get parameter names from the first update
-        param_names = list(self.client_updates[0]['state_dict'].keys())
+    def __init__(self, max_distance=6, chunks=4, max_entries=10000):
+        self.max_distance = max_distance
+        self.chunks = chunks
+        self.chunk_bits = 64 // chunks
+        self.chunk_mask = (1 << self.chunk_bits) - 1
+        self.max_entries = max_entries
+        self.version = None
+        # position -> (hash, payload), oldest first
+        self.entries = OrderedDict()
+        self.tables = [{} for _ in range(chunks)]
+        self._positions = itertools.count()
+        self._lock = threading.Lock()
+
+        # Bit flips to probe around each query chunk
+        chunk_radius = max_distance // chunks
+        self._probe_masks = [0]
+        for radius in range(1, chunk_radius + 1):
+            self._probe_masks.extend(self._flip_masks(radius))
+
+    def _flip_masks(self, radius, start=0):
+        if radius == 0:
+            return [0]
+        masks = []
+        for bit in range(start, self.chunk_bits):
+            for rest in self._flip_masks(radius - 1, bit + 1):
+                masks.append((1 << bit) | rest)
+        return masks
+
+    def _chunks(self, value):
+        return [(value >> (i * self.chunk_bits)) & self.chunk_mask for i in range(self.chunks)]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.tables = [{} for _ in range(self.chunks)]
+
+    def _evict_oldest(self):
+        position, (value, _) = self.entries.popitem(last=False)
+        for table, chunk in zip(self.tables, self._chunks(value)):
+            bucket = table[chunk]
+            bucket.remove(position)
+            if not bucket:
+                del table[chunk]
+
+    def add(self, value, payload, version=None):
+        """Index a perceptual hash with an arbitrary payload under a model version"""
+        with self._lock:
+            if version != self.version:
+                self.entries.clear()
+                self.tables = [{} for _ in range(self.chunks)]
+                self.version = version
+            while len(self.entries) >= self.max_entries:
+                self._evict_oldest()
+
+            position = next(self._positions)
+            self.entries[position] = (value, payload)
+            for table, chunk in zip(self.tables, self._chunks(value)):
+                table.setdefault(chunk, []).append(position)
+
+    def find(self, value, max_distance=None, version=None):
+        """Return (payload, distance) of the closest hash within max_distance indexed under version, or None"""
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+
+        best = None
+        with self._lock:
+            if version != self.version:
+                return None
+            seen = set()
+            for table, chunk in zip(self.tables, self._chunks(value)):
+                for mask in self._probe_masks:
+                    for position in table.get(chunk ^ mask, ()):
+                        if position in seen:
+                            continue
+                        seen.add(position)
+                        distance = bin(self.entries[position][0] ^ value).count('1')
+                        if distance <= max_distance and (best is None or distance < best[1]):
+                            best = (position, distance)
+                            if distance == 0:
+                                return self.entries[position][1], 0
+
+            if best is None:
+                return None
+            return self.entries[best[0]][1], best[1]
+
+class VideoAnalyzer:
+    """Streams video frames, samples them adaptively and aggregates batched detections
+
+    Every frame is still grabbed (which decodes it in the FFmpeg backend), but
+    only every probe_every-th frame is retrieved, colour-converted and
+    checked for scene changes.
+    A probed frame is analyzed when the scene changes or max_gap_seconds have
+    passed since the last analyzed frame. Memory stays bounded by one batch
+    of downscaled frames regardless of video length.
+    """
 
-        for param_name in param_names:
-            # Weighted average of parameters
-            weighted_sum = torch.zeros_like(self.client_updates[0]['state_dict'][param_name])
+    def __init__(self, detect_batch_fn, batch_size=16, probe_every=5, max_gap_seconds=1.0,
+                 scene_threshold=0.3, max_side=640, top_k=5):
+        self.detect_batch_fn = detect_batch_fn
+        self.batch_size = batch_size
+        self.probe_every = probe_every
+        self.max_gap_seconds = max_gap_seconds
+        self.scene_threshold = scene_threshold
+        self.max_side = max_side
+        self.top_k = top_k
 
-            for update in self.client_updates:
-                weight = update['data_size'] / total_data_size
-                weighted_sum += weight * update['state_dict'][param_name]
+    def iter_frames(self, path, progress=None):
+        """Yield (frame_index, fps, BGR frame) for probed frames, skipping retrieval of the rest
 
-            aggregated_params[param_name] = weighted_sum
+        If given, progress['frames'] and progress['fps'] track every grabbed frame.
+        """
+        capture = cv2.VideoCapture(path)
+        if not capture.isOpened():
+            raise ValueError(f"Could not open video: {path}")
+
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        if progress is None:
+            progress = {}
+        progress.update(frames=0, fps=fps)
+        try:
+            frame_index = 0
+            while capture.grab():
+                progress['frames'] = frame_index + 1
+                if frame_index % self.probe_every == 0:
+                    ok, frame = capture.retrieve()
+                    if ok:
+                        yield frame_index, fps, frame
+                frame_index += 1
+        finally:
+            capture.release()
+
+    def _downscale(self, frame):
+        height, width = frame.shape[:2]
+        scale = self.max_side / max(height, width)
+        if scale < 1:
+            frame = cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def _histogram(self, frame):
+        gray = cv2.cvtColor(cv2.resize(frame, (64, 64), interpolation=cv2.INTER_AREA), cv2.COLOR_RGB2GRAY)
+        histogram = cv2.calcHist([gray], [0], None, [64], [0, 256])
+        return cv2.normalize(histogram, histogram).flatten()
+
+    def iter_samples(self, path, progress=None):
+        """Yield (timestamp, RGB frame, is_scene_change) for frames worth analyzing"""
+        last_histogram = None
+        last_sampled_at = None
+        for frame_index, fps, frame in self.iter_frames(path, progress):
+            frame = self._downscale(frame)
+            timestamp = frame_index / fps
+            histogram = self._histogram(frame)
+
+            scene_change = last_histogram is not None and cv2.compareHist(
+                last_histogram, histogram, cv2.HISTCMP_BHATTACHARYYA) > self.scene_threshold
+            if last_sampled_at is None or scene_change or timestamp - last_sampled_at >= self.max_gap_seconds:
+                last_histogram = histogram
+                last_sampled_at = timestamp
+                yield timestamp, frame, scene_change
+
+    def analyze(self, path):
+        """Run detection over a video and aggregate per-frame scores into a verdict"""
+        start_time = time.perf_counter()
+        stats = {'frames': 0, 'fake_frames': 0, 'fake_sum': 0.0, 'confidence_sum': 0.0,
+                 'jitter_sum': 0.0, 'scene_changes': 0, 'last_fake': None}
+        progress = {}
+        most_suspicious = []
+
+        def flush(batch):
+            results = self.detect_batch_fn([frame for _, frame in batch])
+            for (timestamp, _), result in zip(batch, results):
+                fake_probability = result['probabilities']['fake']
+                stats['frames'] += 1
+                stats['fake_frames'] += result['is_deepfake']
+                stats['fake_sum'] += fake_probability
+                stats['confidence_sum'] += result['confidence']
+                # Temporal flicker: how much the fake score jumps between sampled frames
+                if stats['last_fake'] is not None:
+                    stats['jitter_sum'] += abs(fake_probability - stats['last_fake'])
+                stats['last_fake'] = fake_probability
+                heapq.heappush(most_suspicious, (fake_probability, timestamp))
+                if len(most_suspicious) > self.top_k:
+                    heapq.heappop(most_suspicious)
+
+        batch = []
+        for timestamp, frame, scene_change in self.iter_samples(path, progress):
+            stats['scene_changes'] += scene_change
+            batch.append((timestamp, frame))
+            if len(batch) >= self.batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+
+        if stats['frames'] == 0:
+            raise ValueError(f"No frames could be decoded from: {path}")
+
+        processing_seconds = time.perf_counter() - start_time
+        # Length of everything grabbed, not just up to the last sampled frame
+        duration = progress['frames'] / progress['fps']
+        frames = stats['frames']
+        fake_probability = stats['fake_sum'] / frames
+        return {
+            'is_deepfake': fake_probability > 0.5,
+            'confidence': stats['confidence_sum'] / frames,
+            'fake_probability': fake_probability,
+            'fake_frame_ratio': stats['fake_frames'] / frames,
+            'temporal_jitter': stats['jitter_sum'] / max(frames - 1, 1),
+            'frames_analyzed': frames,
+            'scene_changes': stats['scene_changes'],
+            'duration_seconds': duration,
+            'processing_seconds': processing_seconds,
+            'realtime_factor': duration / processing_seconds if processing_seconds else 0,
+            'most_suspicious_frames': [
+                {'timestamp': timestamp, 'fake_probability': probability}
+                for probability, timestamp in sorted(most_suspicious, reverse=True)
+            ]
+        }
 
-        # Update global model
-        self.global_model.load_state_dict(aggregated_params)
+def save_detector_checkpoint(model, path):
+    """Save detector weights atomically so concurrent workers never read a partial file"""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    torch.save(model.state_dict(), temp_path)
+    os.replace(temp_path, path)
 
-        # Clear client updates
-        self.client_updates = []
-        self.round_number += 1
+def load_detector_checkpoint(model, path, mmap=True):
+    """Load detector weights, memory-mapping the checkpoint where torch supports it"""
+    try:
+        state_dict = torch.load(path, map_location='cpu', mmap=mmap, weights_only=True)
+    except TypeError:
+        # torch < 2.1 has no mmap/weights_only arguments
+        state_dict = torch.load(path, map_location='cpu')
+    model.load_state_dict(state_dict)
+    return model
+
+def weights_fingerprint(model):
+    """Short digest of a model's state dict, so cached verdicts are tied to the exact weights"""
+    digest = hashlib.blake2b(digest_size=8)
+    for name, tensor in model.state_dict().items():
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.webp', '.tif', '.tiff')
+
+def _load_shard_image(path, image_size):
+    """Decode one image for a training shard as a (3, image_size, image_size) uint8 array"""
+    try:
+        with Image.open(path) as image:
+            image.draft('RGB', (image_size, image_size))
+            pixels = np.asarray(image.convert('RGB'))
+    except Exception:
+        return None
+    interpolation = cv2.INTER_AREA if min(pixels.shape[:2]) > image_size else cv2.INTER_LINEAR
+    return cv2.resize(pixels, (image_size, image_size), interpolation=interpolation).transpose(2, 0, 1)
+
+def pack_image_shards(labeled_dir, output_dir, shard_size=4096, image_size=224, workers=None):
+    """Pack labeled_dir/real and labeled_dir/fake into memory-mappable training shards
+
+    Each shard is a <name>.images.npy array of shape (N, 3, image_size,
+    image_size) uint8 plus a <name>.labels.npy array (1 for fake). Images
+    are decoded in a thread pool straight into the memory-mapped output,
+    so packing never holds more than one decoded image per thread.
+    Undecodable files are left out of the labels array, whose length is
+    the shard's sample count. Returns the shard prefixes.
+    """
+    samples = []
+    for label, name in ((0, 'real'), (1, 'fake')):
+        folder = os.path.join(labeled_dir, name)
+        samples.extend((os.path.join(folder, filename), label) for filename in sorted(os.listdir(folder))
+                       if filename.lower().endswith(IMAGE_EXTENSIONS))
+    # Mix classes across shards so every shard is a useful training stream on its own
+    np.random.default_rng(0).shuffle(samples)
+
+    os.makedirs(output_dir, exist_ok=True)
+    prefixes = []
+    with ThreadPoolExecutor(workers) as pool:
+        for start in range(0, len(samples), shard_size):
+            shard = samples[start:start + shard_size]
+            prefix = os.path.join(output_dir, f"shard-{len(prefixes):05d}")
+            images = np.lib.format.open_memmap(prefix + '.images.tmp.npy', mode='w+', dtype=np.uint8,
+                                               shape=(len(shard), 3, image_size, image_size))
+            labels = []
+            count = 0
+            for pixels, (_, label) in zip(pool.map(lambda sample: _load_shard_image(sample[0], image_size), shard),
+                                          shard):
+                if pixels is None:
+                    continue
+                images[count] = pixels
+                labels.append(label)
+                count += 1
+            images.flush()
+            del images
+
+            np.save(prefix + '.labels.npy', np.array(labels, dtype=np.int64))
+            os.replace(prefix + '.images.tmp.npy', prefix + '.images.npy')
+            prefixes.append(prefix)
+    return prefixes
+
+def find_image_shards(directory):
+    """Return the prefixes of the training shards in a directory"""
+    return sorted(
+        os.path.join(directory, filename[:-len('.images.npy')])
+        for filename in os.listdir(directory) if filename.endswith('.images.npy')
+    )
+
+class ImageShardDataset(IterableDataset):
+    """Streams (uint8 image, label) samples from memory-mapped training shards
+
+    Shards are dealt round-robin to DataLoader workers and shuffled per
+    epoch (call set_epoch before iterating), and samples are read straight
+    from the memory map, so only the pages being read are resident. Use at
+    most as many workers as there are shards.
+    """
 
-        return f"Federated learning round {self.round_number} completed with {len(self.client_updates)} clients"
+    def __init__(self, shard_prefixes, shuffle=True, seed=0):
+        self.shard_prefixes = list(shard_prefixes)
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __iter__(self):
+        worker = get_worker_info()
+        worker_id, num_workers = (worker.id, worker.num_workers) if worker else (0, 1)
+
+        # Every worker draws the same shard order, then takes its own slice of it
+        generator = np.random.default_rng(self.seed + self.epoch)
+        order = generator.permutation(len(self.shard_prefixes)) if self.shuffle else range(len(self.shard_prefixes))
+        for shard_index in list(order)[worker_id::num_workers]:
+            prefix = self.shard_prefixes[shard_index]
+            images = np.load(prefix + '.images.npy', mmap_mode='r')
+            labels = np.load(prefix + '.labels.npy')
+            indices = generator.permutation(len(labels)) if self.shuffle else range(len(labels))
+            for index in indices:
+                yield torch.from_numpy(np.array(images[index])), int(labels[index])
+
+class DetectorTrainer:
+    """Trains a DeepfakeDetector from image shards without loading the dataset into memory
+
+    DataLoader workers stream uint8 batches (into pinned memory when
+    training on a GPU); normalization happens on whole batches on the
+    training device and forward/backward run under bf16 autocast unless
+    precision='fp32'. With a checkpoint_path, interim weights are saved to
+    <checkpoint_path>.partial every checkpoint_every steps and at each epoch
+    end, next to a .train file holding the optimizer state and position,
+    and a rerun with the same shards and num_workers resumes from there.
+    Only a finished run replaces checkpoint_path itself and removes both
+    files, so serving workers never load half-trained weights.
+    """
+
+    def __init__(self, detector, shard_prefixes, epochs=1, batch_size=64, num_workers=None, learning_rate=0.001,
+                 precision='bf16', checkpoint_path=None, checkpoint_every=500, seed=0, device=None):
+        if precision not in ('bf16', 'fp32'):
+            raise ValueError(f"Unknown training precision: {precision}")
+        self.detector = detector
+        self.shard_prefixes = list(shard_prefixes)
+        self.epochs = epochs
+        self.batch_size = batch_size
+        if num_workers is None:
+            num_workers = min(len(self.shard_prefixes), max(1, (os.cpu_count() or 1) // 2))
+        self.num_workers = num_workers
+        self.learning_rate = learning_rate
+        self.precision = precision
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
+        self.seed = seed
+        self.device = torch.device(device or ('cuda' if torch.cuda.is_available() else 'cpu'))
+
+    def _save_checkpoint(self, optimizer, epoch, step):
+        save_detector_checkpoint(self.detector, f"{self.checkpoint_path}.partial")
+        temp_path = f"{self.checkpoint_path}.train.{os.getpid()}.tmp"
+        torch.save({'optimizer': optimizer.state_dict(), 'epoch': epoch, 'step': step}, temp_path)
+        os.replace(temp_path, f"{self.checkpoint_path}.train")
+
+    def _finish_checkpoint(self):
+        """Publish the finished weights as the serving checkpoint and drop the resume state"""
+        save_detector_checkpoint(self.detector, self.checkpoint_path)
+        for suffix in ('.train', '.partial'):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.checkpoint_path + suffix)
+
+    def _resume(self, optimizer):
+        """Restore weights, optimizer state and (epoch, step) from an interrupted run, if any"""
+        if not self.checkpoint_path:
+            return 0, 0
+        state_path = f"{self.checkpoint_path}.train"
+        weights_path = f"{self.checkpoint_path}.partial"
+        if not os.path.exists(state_path) or not os.path.exists(weights_path):
+            return 0, 0
+        load_detector_checkpoint(self.detector, weights_path, mmap=False)
+        try:
+            state = torch.load(state_path, map_location=self.device, weights_only=True)
+        except TypeError:
+            state = torch.load(state_path, map_location=self.device)
+        optimizer.load_state_dict(state['optimizer'])
+        return state['epoch'], state['step']
+
+    def run(self):
+        """Train and return throughput and loss statistics"""
+        torch.manual_seed(self.seed)
+        self.detector.to(self.device)
+        optimizer = torch.optim.Adam(self.detector.parameters(), lr=self.learning_rate)
+        start_epoch, start_step = self._resume(optimizer)
+        criterion = nn.CrossEntropyLoss()
+
+        dataset = ImageShardDataset(self.shard_prefixes, seed=self.seed)
+        loader = DataLoader(
+            dataset,
+            batch_size=self.batch_size,
+            num_workers=self.num_workers,
+            pin_memory=self.device.type == 'cuda',
+            **({'prefetch_factor': 4} if self.num_workers else {})
+        )
+
+        # Same folded normalization as ImagePreprocessor, applied to whole uint8 batches
+        preprocessor = ImagePreprocessor()
+        scale = torch.from_numpy(preprocessor.scale).to(self.device)
+        offset = torch.from_numpy(preprocessor.offset).to(self.device)
+
+        steps = samples = 0
+        loss_sum = 0.0
+        last_loss = None
+        start = time.perf_counter()
+        self.detector.train()
+        for epoch in range(start_epoch, self.epochs):
+            dataset.set_epoch(epoch)
+            for step, (images, labels) in enumerate(loader):
+                # The data order is fixed per epoch, so resuming skips what was already trained on
+                if epoch == start_epoch and step < start_step:
+                    continue
+
+                images = images.to(self.device, non_blocking=True).float().mul_(scale).add_(offset)
+                labels = labels.to(self.device, non_blocking=True)
+                with torch.autocast(self.device.type, dtype=torch.bfloat16, enabled=self.precision == 'bf16'):
+                    loss = criterion(self.detector(images), labels)
+
+                optimizer.zero_grad(set_to_none=True)
+                loss.backward()
+                optimizer.step()
+
+                steps += 1
+                samples += len(labels)
+                last_loss = loss.item()
+                loss_sum += last_loss
+                if self.checkpoint_path and steps % self.checkpoint_every == 0:
+                    self._save_checkpoint(optimizer, epoch, step + 1)
+
+            if self.checkpoint_path:
+                self._save_checkpoint(optimizer, epoch + 1, 0)
+
+        elapsed = time.perf_counter() - start
+        self.detector.eval()
+        self.detector.to('cpu')
+        if self.checkpoint_path:
+            self._finish_checkpoint()
+        return {
+            'epochs': self.epochs,
+            'resumed_from': {'epoch': start_epoch, 'step': start_step},
+            'steps': steps,
+            'samples': samples,
+            'samples_per_second': samples / elapsed if elapsed else 0,
+            'mean_loss': loss_sum / steps if steps else None,
+            'final_loss': last_loss,
+            'precision': self.precision,
+            'device': str(self.device),
+            'num_workers': self.num_workers,
+            'peak_rss_mb': _peak_rss_mb()
+        }
 
 class DeepfakeImmunizationToolkit:
     """Main toolkit class combining all components"""
 
-    def __init__(self):
+    def __init__(self, max_batch_size=8, max_wait_ms=5, ledger_path=None, registration_batch_size=0,
+                 cache_size=10000, cache_ttl=3600, cache_path=None, near_duplicate_distance=None,
+                 checkpoint_path=None, inference_mode='fp32', inference_compiler=None, federated_mode='sync',
+                 hash_algorithm='sha256', max_tiles=0, cascade=None, detection_timeout=30):
         self.detector = DeepfakeDetector()
-        self.blockchain = SimpleBlockchain()
-        self.federated_learning = FederatedLearning(self.detector)
-        self.training_data = []
+        self.blockchain = SimpleBlockchain(ledger_path, batch_size=registration_batch_size,
+                                           hash_algorithm=hash_algorithm)
+        self.federated_learning = FederatedLearning(self.detector, mode=federated_mode)
+        self.engine = DetectionEngine(self.detector, max_tiles=max_tiles, cascade=cascade)
+        self.preprocessor = self.engine.preprocessor
+        self.heuristics = self.engine.heuristics
         self.user_scores = {'correct': 0, 'total': 0}
 
-        # Initialize with some training
-        self._initialize_model()
+        # Concurrent analyze_image calls share forward passes through this queue
+        self.batcher = DetectionBatcher(self.detect_deepfake_batch, max_batch_size, max_wait_ms)
+
+        # Multi-process serving is opt-in through start_worker_pool()
+        self.worker_pool = None
+        # Seconds a request waits on the batcher or worker pool before failing
+        self.detection_timeout = detection_timeout
+
+        # Repeated uploads of the same content skip detection entirely
+        self.detection_cache = DetectionCache(cache_size, cache_ttl, cache_path)
+
+        # Opt-in: re-encoded or resized copies reuse an earlier verdict. A small edit such as a
+        # face swap can stay within the radius too, so this is off unless a distance is given
+        self.near_duplicates = None
+        if near_duplicate_distance is not None:
+            self.near_duplicates = PerceptualHashIndex(near_duplicate_distance, max_entries=cache_size)
+
+        # Load cached weights, or initialize with some training and cache the result
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            load_detector_checkpoint(self.detector, checkpoint_path)
+            self.detector.eval()
+        else:
+            self._initialize_model()
+            if checkpoint_path:
+                save_detector_checkpoint(self.detector, checkpoint_path)
+        self.federated_learning.resnapshot()
+
+        # Part of model_version, so persisted cache entries from other weights are never reused
+        self.weights_fingerprint = weights_fingerprint(self.detector)
+
+        self._register_gauges()
+
+        # Optionally serve from a fused/quantized export of the trained weights
+        self.inference_mode = 'fp32'
+        self.inference_report = None
+        if inference_mode != 'fp32' or inference_compiler:
+            self.set_inference_mode(inference_mode, inference_compiler)
+
+    def _register_gauges(self):
+        metrics.register_gauge('batch_queue_depth', self.batcher.requests.qsize, "Images waiting for the detection batcher")
+        metrics.register_gauge('worker_pool_pending', lambda: len(self.worker_pool.pending) if self.worker_pool else 0,
+                               "Images in flight in the inference worker pool")
+        metrics.register_gauge('cache_entries', lambda: len(self.detection_cache.entries), "Cached detection results")
+        metrics.register_counter('cache_hits', lambda: self.detection_cache.hits, "Detection cache hits")
+        metrics.register_counter('cache_misses', lambda: self.detection_cache.misses, "Detection cache misses")
+        metrics.register_gauge('near_duplicate_index_size', lambda: len(self.near_duplicates or ()),
+                               "Indexed perceptual hashes")
+        metrics.register_gauge('registry_blocks', lambda: len(self.blockchain.chain), "Blocks in the content registry")
+        metrics.register_gauge('registry_items', lambda: len(self.blockchain.content_index), "Registered content hashes")
+        metrics.register_gauge('registry_pending', lambda: len(self.blockchain.pending_registrations),
+                               "Registrations waiting for a Merkle batch")
+
+    def profile_detection(self, images, kind='cprofile', output_path='detection_profile.out'):
+        """Run batched detection under cProfile or the torch profiler and write the capture"""
+        with profile_capture(kind, output_path):
+            results = self.detect_deepfake_batch(images)
+        return results
 
     def _initialize_model(self):
         """Initialize the model with some basic training"""
@@ -225,84 +2934,206 @@ class DeepfakeImmunizationToolkit:
 
     def preprocess_image(self, image):
         """Preprocess image for the model"""
-        if isinstance(image, np.ndarray):
-            image = Image.fromarray(image)
-
-        transform = transforms.Compose([
-            transforms.Resize((224, 224)),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406],
-                               std=[0.229, 0.224, 0.225])
-        ])
-
-        return transform(image).unsqueeze(0)
+        # Copy out of the preprocessor's reusable buffer since callers may hold on to it
+        return self.preprocessor.preprocess_batch([image]).clone()
 
     def detect_deepfake(self, image):
         """Detect if an image is a deepfake"""
-        try:
-            processed_image = self.preprocess_image(image)
+        return self.detect_deepfake_batch([image])[0]
+
+    def detect_deepfake_batch(self, images):
+        """Detect deepfakes for a list of images with one stacked forward pass"""
+        return self.engine.detect_batch(images)
+
+    @property
+    def model_version(self):
+        """Identifies the current detector weights for cache keys"""
+        return self._model_version(self._serving_pool() is not None)
+
+    def _serving_pool(self):
+        """The worker pool if it is serving; a broken pool has already failed its requests"""
+        if self.worker_pool is not None and not self.worker_pool.broken:
+            return self.worker_pool
+        return None
+
+    def _model_version(self, pool_serving):
+        # The pool always runs the fp32 shared weights, whatever export the engine uses
+        inference_mode = 'fp32' if pool_serving else self.inference_mode
+        version = f"detector-{self.weights_fingerprint}-r{self.federated_learning.round_number}-{inference_mode}"
+        if self.engine.max_tiles:
+            version += f"-t{self.engine.max_tiles}"
+        if self.engine.cascade is not None:
+            version += f"-{self.engine.cascade.key}"
+        return version
+
+    def detect_deepfake_cached(self, image, content_hash):
+        """Detect through the result cache and the shared batching queue (or the worker pool)"""
+        # Pick the detector first so its verdicts are cached under the version that produced them;
+        # a broken pool falls back to in-process batching
+        pool = self._serving_pool()
+        detector = pool or self.batcher
+        model_version = self._model_version(pool is not None)
+        result = self.detection_cache.get(content_hash, model_version)
+        if result is not None:
+            result['cached'] = True
+            return result
+
+        image_phash = None
+        if self.near_duplicates is not None:
+            try:
+                with metrics.span('perceptual_hash'):
+                    image_phash = perceptual_hash(image)
+            except Exception:
+                image_phash = None
+
+        if image_phash is not None:
+            match = self.near_duplicates.find(image_phash, version=model_version)
+            if match is not None:
+                metrics.increment('near_duplicate_hits')
+                original, distance = match
+                result = dict(original['result'])
+                result['near_duplicate_of'] = original['content_hash']
+                result['hamming_distance'] = distance
+                self.detection_cache.put(content_hash, model_version, result)
+                return result
 
-            with torch.no_grad():
-                outputs = self.detector(processed_image)
-                probabilities = outputs[0]
-
-                is_fake = probabilities[1].item() > 0.5
-                confidence = max(probabilities).item()
+        try:
+            result = detector.detect(image, self.detection_timeout)
+        except (TimeoutError, FuturesTimeoutError):
+            metrics.increment('detection_errors')
+            return self.engine.detection_error(f"Detection timed out after {self.detection_timeout} s")
+        except RuntimeError as e:
+            metrics.increment('detection_errors')
+            return self.engine.detection_error(e)
+        if 'error' not in result:
+            self.detection_cache.put(content_hash, model_version, result)
+            if image_phash is not None:
+                self.near_duplicates.add(image_phash, {
+                    'content_hash': content_hash,
+                    'result': result
+                }, version=model_version)
+        return result
+
+    def calibration_batches(self, num_batches=4, batch_size=8):
+        """Preprocessed batches of synthetic training examples for quantization calibration"""
+        difficulties = ['easy', 'medium', 'hard']
+        batches = []
+        for batch_number in range(num_batches):
+            images = [
+                self.generate_training_example(difficulties[(batch_number + i) % len(difficulties)])['image']
+                for i in range(batch_size)
+            ]
+            batches.append(self.preprocessor.preprocess_batch(images).clone())
+        return batches
+
+    def set_inference_mode(self, mode, compiler=None, calibration_batches=None, evaluation_batches=None):
+        """Switch detection to an optimized export of self.detector and report its accuracy delta
+
+        The accuracy delta is measured on evaluation_batches, which default to
+        freshly generated examples rather than the calibration batches, so
+        static INT8 is not scored on the data it was calibrated on.
+
+        The export is a snapshot: after federated rounds update self.detector,
+        call this again to re-export. The worker pool always serves the fp32
+        shared-memory weights.
+        """
+        if mode == 'fp32' and not compiler:
+            self.engine.detector = self.detector
+            self.inference_mode = mode
+            self.inference_report = None
+            return None
+
+        batches = calibration_batches or self.calibration_batches()
+        model = build_inference_model(self.detector, mode, batches, compiler=compiler)
+        held_out = evaluation_batches or self.calibration_batches()
+        self.inference_report = compare_inference_models(self.detector, model, held_out)
+        self.inference_report['mode'] = mode
+        self.inference_report['compiler'] = compiler
+
+        self.engine.detector = model
+        self.inference_mode = mode if not compiler else f"{mode}+{compiler}"
+        return self.inference_report
+
+    def train_from_shards(self, shard_prefixes, **options):
+        """Retrain self.detector on image shards written by pack_image_shards
+
+        Options go to DetectorTrainer. Training runs on a copy so requests
+        served meanwhile see the old weights in eval mode; the result is then
+        copied into self.detector in place, and an optimized inference export
+        is rebuilt from the new weights.
+        """
+        trained = copy.deepcopy(self.detector)
+        report = DetectorTrainer(trained, shard_prefixes, **options).run()
+        self.detector.load_state_dict(trained.state_dict())
+        self.federated_learning.resnapshot()
+        self.weights_fingerprint = weights_fingerprint(self.detector)
+        if self.engine.detector is not self.detector:
+            mode, _, compiler = self.inference_mode.partition('+')
+            self.set_inference_mode(mode, compiler or None)
+        return report
+
+    def calibrate_cascade(self, images, labels, max_error=0.02):
+        """Fit and install early-exit cascade thresholds from labeled images (1 = fake, 0 = real)
+
+        Images whose heuristics cannot be computed are left out; the cascade
+        never gates on them.
+        """
+        heuristic_scores = []
+        fake_probabilities = [] if self.engine.max_tiles else None
+        for start in range(0, len(images), self.batcher.max_batch_size):
+            batch = images[start:start + self.batcher.max_batch_size]
+            batch_scores = self.engine.heuristic_scores(batch)
+            heuristic_scores.extend(batch_scores)
+            if fake_probabilities is not None:
+                results = self.engine.model_results(batch, batch_scores, tiled=False)
+                fake_probabilities.extend(result['probabilities']['fake'] for result in results)
+
+        scored = [i for i, score in enumerate(heuristic_scores) if score is not None]
+        self.engine.cascade = DetectionCascade.calibrate(
+            [heuristic_scores[i] for i in scored],
+            [labels[i] for i in scored],
+            max_error,
+            [fake_probabilities[i] for i in scored] if fake_probabilities is not None else None
+        )
+        return self.engine.cascade
+
+    def cascade_report(self):
+        """Per-stage pass-through rates for the early-exit cascade, or None when it is off"""
+        cascade = self.engine.cascade
+        if cascade is None:
+            return None
+        return {'thresholds': cascade.thresholds(), 'stages': cascade.report()}
+
+    def start_worker_pool(self, num_workers=None, **options):
+        """Serve detections from worker processes sharing this toolkit's detector weights"""
+        if self.worker_pool is None:
+            self.worker_pool = InferenceWorkerPool(
+                self.detector, num_workers, max_batch_size=self.batcher.max_batch_size,
+                max_tiles=self.engine.max_tiles,
+                cascade=self.engine.cascade, **options
+            )
+        return self.worker_pool
 
-                # Additional heuristic checks
-                heuristic_score = self._heuristic_analysis(image)
+    def stop_worker_pool(self):
+        if self.worker_pool is not None:
+            self.worker_pool.close()
+            self.worker_pool = None
 
-                # Combine model prediction with heuristics
-                final_confidence = (confidence + heuristic_score) / 2
+    def close(self):
+        """Stop serving, persist the detection cache and seal pending registrations"""
+        self.stop_worker_pool()
+        self.batcher.close()
+        self.detection_cache.save()
+        self.blockchain.close()
 
-                return {
-                    'is_deepfake': is_fake,
-                    'confidence': final_confidence,
-                    'model_confidence': confidence,
-                    'heuristic_score': heuristic_score,
-                    'probabilities': {
-                        'real': probabilities[0].item(),
-                        'fake': probabilities[1].item()
-                    }
-                }
-        except Exception as e:
-            return {
-                'is_deepfake': False,
-                'confidence': 0.5,
-                'error': str(e),
-                'probabilities': {'real': 0.5, 'fake': 0.5}
-            }
+    def detect_deepfake_video(self, path, **options):
+        """Detect deepfakes in a video file by sampling frames and batching detection"""
+        return VideoAnalyzer(self.detect_deepfake_batch, **options).analyze(path)
 
     def _heuristic_analysis(self, image):
         """Simple heuristic analysis for deepfake detection"""
-        try:
-            if isinstance(image, Image.Image):
-                image = np.array(image)
-
-            # Convert to grayscale for analysis
-            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-
-            # Check for inconsistencies that might indicate deepfakes
-            # 1. Blurriness analysis
-            laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-            blur_score = min(laplacian_var / 1000, 1.0)
-
-            # 2. Edge consistency
-            edges = cv2.Canny(gray, 50, 150)
-            edge_density = np.sum(edges > 0) / edges.size
-
-            # 3. Frequency analysis
-            f_transform = np.fft.fft2(gray)
-            f_shift = np.fft.fftshift(f_transform)
-            magnitude_spectrum = np.log(np.abs(f_shift) + 1)
-            freq_score = np.std(magnitude_spectrum) / 10
-
-            # Combine heuristics (lower scores suggest more likely to be fake)
-            heuristic_score = (blur_score + edge_density + min(freq_score, 1.0)) / 3
-
-            return heuristic_score
-        except:
-            return 0.5
+        score = self.engine.heuristic_scores([image])[0]
+        return 0.5 if score is None else score
 
     def generate_training_example(self, difficulty='medium'):
         """Generate a training example for user education"""
@@ -351,27 +3182,72 @@ class DeepfakeImmunizationToolkit:
             'difficulty': difficulty
         }
 
-    def verify_content_authenticity(self, image):
-        """Verify content authenticity using blockchain"""
-        # Create content hash
-        image_bytes = cv2.imencode('.jpg', image)[1].tobytes()
-        content_hash = hashlib.sha256(image_bytes).hexdigest()
+    def compute_content_hash(self, image):
+        """Return the content hash of an image (array, bytes or file path) and the size of the hashed bytes"""
+        with metrics.span('content_hash'):
+            content_hash, content_size, _ = hash_content(image, self.blockchain.hash_algorithm)
+        return content_hash, content_size
+
+    def _content_format(self, image):
+        if self.blockchain.hash_algorithm == 'jpeg-sha256':
+            return 'image/jpeg'
+        return 'file' if isinstance(image, (str, bytes, bytearray, memoryview)) else 'raw-pixels'
+
+    def verify_content_authenticity(self, image, content_hash=None, content_size=None, near_duplicate_of=None):
+        """Verify content authenticity using blockchain
+
+        With batched registration, content already waiting for its batch is
+        reported as 'pending_batch' rather than registered again. Once the
+        batch is sealed, verifying the same content returns its Merkle
+        inclusion proof (also available from blockchain.get_inclusion_proof).
+        """
+        # Create content hash (callers that already hashed the image can pass it in)
+        if content_hash is None:
+            content_hash, content_size = self.compute_content_hash(image)
 
         # Check blockchain
-        is_verified, block = self.blockchain.verify_content(content_hash)
+        with metrics.span('registry_lookup'):
+            is_verified, block = self.blockchain.verify_content(content_hash)
 
         if not is_verified:
+            ticket = self.blockchain.pending_ticket(content_hash) if self.blockchain.batch_size else None
+            if ticket is not None:
+                return {
+                    'is_verified': False,
+                    'status': 'pending_batch',
+                    'batch_status': ticket['status'],
+                    'batch_position': ticket['batch_position'],
+                    'inclusion_proof': None,
+                    'content_hash': content_hash
+                }
+
             # Add to blockchain as new content
             verification_data = {
                 'content_hash': content_hash,
                 'timestamp': datetime.now().isoformat(),
                 'verification_status': 'pending',
                 'metadata': {
-                    'size': len(image_bytes),
-                    'format': 'image/jpeg'
+                    'size': content_size,
+                    'format': self._content_format(image),
+                    'hash_algorithm': self.blockchain.hash_algorithm
                 }
             }
-            block_hash = self.blockchain.add_block(verification_data)
+            if near_duplicate_of:
+                verification_data['metadata']['near_duplicate_of'] = near_duplicate_of
+            if self.blockchain.batch_size:
+                # Sealed later with other uploads into one Merkle batch block
+                with metrics.span('registry_append'):
+                    ticket = self.blockchain.queue_registration(verification_data)
+                return {
+                    'is_verified': False,
+                    'status': 'newly_registered',
+                    'batch_status': ticket['status'],
+                    'inclusion_proof': ticket.get('inclusion_proof'),
+                    'content_hash': content_hash
+                }
+
+            with metrics.span('registry_append'):
+                block_hash = self.blockchain.add_block(verification_data)
 
             return {
                 'is_verified': False,
@@ -384,6 +3260,7 @@ class DeepfakeImmunizationToolkit:
             'is_verified': True,
             'status': 'verified',
             'block_info': block,
+            'inclusion_proof': self.blockchain.get_inclusion_proof(content_hash),
             'content_hash': content_hash
         }
 
@@ -418,64 +3295,245 @@ class DeepfakeImmunizationToolkit:
             'level': level
         }
 
-# Initialize the toolkit
-toolkit = DeepfakeImmunizationToolkit()
+class ServiceOverloaded(Exception):
+    """Raised when the analysis queue is full (HTTP 429 semantics)"""
+
+class AsyncAnalysisService:
+    """Asyncio front end that offloads each analysis stage to a bounded executor
+
+    Hashing, detection and blockchain verification run on a thread pool
+    (cv2, numpy, hashlib and torch release the GIL for their heavy work, so
+    threads avoid pickling full images to other processes). Detection and
+    verification run concurrently once the content hash is known, and at
+    most max_pending requests are admitted; the rest are rejected with
+    ServiceOverloaded instead of queueing until latency collapses.
+    """
+
+    def __init__(self, toolkit, max_pending=64, max_workers=None):
+        self.toolkit = toolkit
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or min(32, (os.cpu_count() or 1) + 4),
+                                           thread_name_prefix='analysis')
+        self.pending = 0
+        self.rejected = 0
+        metrics.register_gauge('analysis_pending', lambda: self.pending, "Analyses admitted by the async service")
+        metrics.register_counter('analysis_rejected', lambda: self.rejected, "Analyses rejected with 429")
+
+    async def _offload(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def analyze(self, image):
+        """Return (detection_result, verification_result) for an image"""
+        # Only touched from the event loop thread, so no lock is needed
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ServiceOverloaded(f"{self.pending} analyses already in progress.")
+
+        self.pending += 1
+        try:
+            with metrics.span('analyze_total'):
+                content_hash, content_size = await self._offload(self.toolkit.compute_content_hash, image)
+
+                # Near-duplicate info is only known after detection, so concurrent
+                # verification registers new content without it
+                return await asyncio.gather(
+                    self._offload(self.toolkit.detect_deepfake_cached, image, content_hash),
+                    self._offload(self.toolkit.verify_content_authenticity, image, content_hash, content_size)
+                )
+        finally:
+            self.pending -= 1
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+# The toolkit is built on first use rather than at import
+_toolkit = None
+_toolkit_lock = threading.Lock()
+
+def get_toolkit():
+    """Return the shared toolkit, constructing it on first call
+
+    Set DEEPFAKE_LEDGER_PATH to keep registrations across restarts,
+    DEEPFAKE_CACHE_PATH to persist detection results,
+    DEEPFAKE_NEAR_DUPLICATE_DISTANCE to reuse verdicts for uploads within
+    that perceptual-hash Hamming distance,
+    DEEPFAKE_HASH_ALGORITHM to pick the registry's content hash,
+    DEEPFAKE_INFERENCE_MODE / DEEPFAKE_INFERENCE_COMPILER to serve an
+    optimized export, DEEPFAKE_INFERENCE_WORKERS to serve detections
+    from a process pool, DEEPFAKE_MAX_TILES to add tiled inference on
+    high-resolution uploads, DEEPFAKE_CASCADE_PATH to gate the CNN with
+    thresholds saved by the calibrate command and DEEPFAKE_METRICS_PORT
+    to expose Prometheus metrics.
+    """
+    global _toolkit
+    if _toolkit is None:
+        with _toolkit_lock:
+            if _toolkit is None:
+                metrics_port = os.environ.get('DEEPFAKE_METRICS_PORT')
+                if metrics_port:
+                    start_metrics_server(int(metrics_port))
+
+                cascade_path = os.environ.get('DEEPFAKE_CASCADE_PATH')
+                near_duplicate_distance = os.environ.get('DEEPFAKE_NEAR_DUPLICATE_DISTANCE')
+
+                toolkit = DeepfakeImmunizationToolkit(
+                    ledger_path=os.environ.get('DEEPFAKE_LEDGER_PATH'),
+                    cache_path=os.environ.get('DEEPFAKE_CACHE_PATH'),
+                    near_duplicate_distance=int(near_duplicate_distance) if near_duplicate_distance else None,
+                    checkpoint_path=DEFAULT_CHECKPOINT_PATH,
+                    hash_algorithm=os.environ.get('DEEPFAKE_HASH_ALGORITHM', 'sha256'),
+                    inference_mode=os.environ.get('DEEPFAKE_INFERENCE_MODE', 'fp32'),
+                    inference_compiler=os.environ.get('DEEPFAKE_INFERENCE_COMPILER') or None,
+                    max_tiles=int(os.environ.get('DEEPFAKE_MAX_TILES', '0')),
+                    cascade=DetectionCascade.load(cascade_path) if cascade_path else None
+                )
+                inference_workers = int(os.environ.get('DEEPFAKE_INFERENCE_WORKERS', '0'))
+                if inference_workers > 0:
+                    toolkit.start_worker_pool(inference_workers)
+                # The cache only persists every persist_every puts and batches seal on a timer
+                atexit.register(toolkit.close)
+                _toolkit = toolkit
+    return _toolkit
+
+_analysis_service = None
+
+def get_analysis_service():
+    """Return the shared async analysis service (queue limit from DEEPFAKE_MAX_PENDING)"""
+    global _analysis_service
+    if _analysis_service is None:
+        toolkit = get_toolkit()
+        with _toolkit_lock:
+            if _analysis_service is None:
+                _analysis_service = AsyncAnalysisService(
+                    toolkit, max_pending=int(os.environ.get('DEEPFAKE_MAX_PENDING', '64'))
+                )
+    return _analysis_service
 
 # Gradio Interface Functions
+def format_analysis_results(detection_result, verification_result):
+    """Format detection and verification results for the detection tab"""
+    heuristic_score = detection_result.get('heuristic_score')
+    heuristic_text = 'unavailable' if heuristic_score is None else f"{heuristic_score:.2%}"
+
+    # Format results
+    detection_text = f"""
+    🔍 **Deepfake Detection Results:**
+
+    **Prediction:** {'🚨 LIKELY DEEPFAKE' if detection_result['is_deepfake'] else '✅ LIKELY AUTHENTIC'}
+
+    **Confidence:** {detection_result['confidence']:.2%}
+
+    **Detailed Analysis:**
+    - Real probability: {detection_result['probabilities']['real']:.2%}
+    - Fake probability: {detection_result['probabilities']['fake']:.2%}
+    - Model confidence: {detection_result.get('model_confidence', 0):.2%}
+    - Heuristic score: {heuristic_text}
+    """
+
+    if verification_result['is_verified']:
+        verification_details = 'Previously verified content'
+    elif verification_result['status'] == 'pending_batch':
+        verification_details = 'Already submitted; waiting to be sealed into the next registration batch'
+    else:
+        verification_details = 'New content registered on blockchain'
+
+    verification_text = f"""
+    🔐 **Blockchain Verification:**
+
+    **Status:** {verification_result['status'].upper()}
+
+    **Content Hash:** {verification_result['content_hash'][:16]}...
+
+    **Details:** {verification_details}
+    """
+
+    # Generate recommendation
+    if detection_result['is_deepfake'] and detection_result['confidence'] > 0.7:
+        recommendation = "⚠️ **HIGH RISK**: This content shows strong indicators of being synthetic/manipulated. Exercise extreme caution before sharing."
+    elif detection_result['is_deepfake'] and detection_result['confidence'] > 0.5:
+        recommendation = "⚠️ **MEDIUM RISK**: This content may be synthetic. Verify from original sources before trusting."
+    else:
+        recommendation = "✅ **LOW RISK**: This content appears authentic, but always verify important information from multiple sources."
+
+    status = "Analysis completed successfully! (cached result)" if detection_result.get('cached') else "Analysis completed successfully!"
+
+    return detection_text, verification_text, recommendation, status
+
 def analyze_image(image):
     """Main image analysis function"""
     if image is None:
         return "Please upload an image.", "", "", ""
 
     try:
-        # Detect deepfake
-        detection_result = toolkit.detect_deepfake(image)
+        toolkit = get_toolkit()
+
+        # Hash once; the hash keys both the result cache and the blockchain lookup
+        content_hash, content_size = toolkit.compute_content_hash(image)
+
+        # Detect deepfake (cached, or coalesced with concurrent requests into one forward pass)
+        detection_result = toolkit.detect_deepfake_cached(image, content_hash)
 
         # Verify authenticity
-        verification_result = toolkit.verify_content_authenticity(image)
+        verification_result = toolkit.verify_content_authenticity(
+            image, content_hash, content_size, detection_result.get('near_duplicate_of')
+        )
+
+        return format_analysis_results(detection_result, verification_result)
+
+    except Exception as e:
+        return f"Error analyzing image: {str(e)}", "", "", ""
 
-        # Format results
-        detection_text = f"""
-        🔍 **Deepfake Detection Results:**
+async def analyze_image_async(image):
+    """Main image analysis function for the asyncio event loop"""
+    if image is None:
+        return "Please upload an image.", "", "", ""
 
-        **Prediction:** {'🚨 LIKELY DEEPFAKE' if detection_result['is_deepfake'] else '✅ LIKELY AUTHENTIC'}
+    try:
+        detection_result, verification_result = await get_analysis_service().analyze(image)
+        return format_analysis_results(detection_result, verification_result)
 
-        **Confidence:** {detection_result['confidence']:.2%}
+    except ServiceOverloaded as e:
+        return f"⏳ Server busy (429): {str(e)} Please try again in a moment.", "", "", "Rejected: too many requests"
+    except Exception as e:
+        return f"Error analyzing image: {str(e)}", "", "", ""
 
-        **Detailed Analysis:**
-        - Real probability: {detection_result['probabilities']['real']:.2%}
-        - Fake probability: {detection_result['probabilities']['fake']:.2%}
-        - Model confidence: {detection_result.get('model_confidence', 0):.2%}
-        - Heuristic score: {detection_result.get('heuristic_score', 0):.2%}
-        """
+def analyze_video(video_path):
+    """Video analysis function"""
+    if not video_path:
+        return "Please upload a video."
 
-        verification_text = f"""
-        🔐 **Blockchain Verification:**
+    try:
+        result = get_toolkit().detect_deepfake_video(video_path)
 
-        **Status:** {verification_result['status'].upper()}
+        suspicious_list = []
+        for frame in result['most_suspicious_frames']:
+            suspicious_list.append(f"• {frame['timestamp']:.1f}s: {frame['fake_probability']:.2%} fake")
+        suspicious_formatted = "\n".join(suspicious_list)
 
-        **Content Hash:** {verification_result['content_hash'][:16]}...
+        return f"""🎬 **Video Deepfake Analysis:**
 
-        **Details:** {'Previously verified content' if verification_result['is_verified'] else 'New content registered on blockchain'}
-        """
+**Prediction:** {'🚨 LIKELY DEEPFAKE' if result['is_deepfake'] else '✅ LIKELY AUTHENTIC'}
 
-        # Generate recommendation
-        if detection_result['is_deepfake'] and detection_result['confidence'] > 0.7:
-            recommendation = "⚠️ **HIGH RISK**: This content shows strong indicators of being synthetic/manipulated. Exercise extreme caution before sharing."
-        elif detection_result['is_deepfake'] and detection_result['confidence'] > 0.5:
-            recommendation = "⚠️ **MEDIUM RISK**: This content may be synthetic. Verify from original sources before trusting."
-        else:
-            recommendation = "✅ **LOW RISK**: This content appears authentic, but always verify important information from multiple sources."
+**Confidence:** {result['confidence']:.2%}
 
-        return detection_text, verification_text, recommendation, "Analysis completed successfully!"
+**Detailed Analysis:**
+- Average fake probability: {result['fake_probability']:.2%}
+- Frames flagged as fake: {result['fake_frame_ratio']:.2%}
+- Temporal jitter: {result['temporal_jitter']:.3f}
+- Frames analyzed: {result['frames_analyzed']} ({result['scene_changes']} scene changes)
+- Processed {result['duration_seconds']:.1f}s of video in {result['processing_seconds']:.1f}s
+
+**Most suspicious moments:**
+{suspicious_formatted}
+"""
 
     except Exception as e:
-        return f"Error analyzing image: {str(e)}", "", "", ""
+        return f"Error analyzing video: {str(e)}"
 
 def generate_training_sample(difficulty):
     """Generate training sample for user education"""
     try:
-        sample = toolkit.generate_training_example(difficulty.lower())
+        sample = get_toolkit().generate_training_example(difficulty.lower())
 
         hints_list = []
         for hint in sample['hints']:
@@ -515,6 +3573,7 @@ def check_training_answer(user_answer):
     if not user_answer:
         return "Please select an answer (Real or Fake)!"
 
+    toolkit = get_toolkit()
     is_correct = toolkit.update_user_training_score(user_answer, current_training_answer)
     progress = toolkit.get_user_progress()
 
@@ -570,149 +3629,760 @@ def get_detection_tips():
     return tips
 
 # Create Gradio Interface
-with gr.Blocks(title="Deepfake Immunization Toolkit", theme=gr.themes.Soft()) as demo:
-    gr.Markdown("""
-    # 🛡️ Deepfake Immunization Toolkit
-
-    **Advanced AI-powered system for deepfake detection, user training, and content verification**
-
-    This toolkit combines machine learning, federated learning, and blockchain technology to help users identify and combat synthetic media.
-    """)
-
-    with gr.Tabs():
-        # Main Detection Tab
-        with gr.TabItem("🔍 Deepfake Detection"):
-            gr.Markdown("Upload an image to analyze for deepfake indicators")
-
-            with gr.Row():
-                with gr.Column():
-                    input_image = gr.Image(type="numpy", label="Upload Image for Analysis")
-                    analyze_btn = gr.Button("🔍 Analyze Image", variant="primary")
-
-                with gr.Column():
-                    detection_output = gr.Textbox(label="Detection Results", lines=10)
-                    verification_output = gr.Textbox(label="Blockchain Verification", lines=6)
-                    recommendation_output = gr.Textbox(label="Recommendation", lines=3)
-                    status_output = gr.Textbox(label="Status", lines=1)
-
-            analyze_btn.click(
-                analyze_image,
-                inputs=[input_image],
-                outputs=[detection_output, verification_output, recommendation_output, status_output]
-            )
-
-        # Training Tab
-        with gr.TabItem("🎯 Training Mode"):
-            gr.Markdown("Practice identifying deepfakes with AI-generated examples")
-
-            with gr.Row():
-                with gr.Column():
-                    difficulty_dropdown = gr.Dropdown(
-                        choices=["Easy", "Medium", "Hard"],
-                        value="Medium",
-                        label="Difficulty Level"
-                    )
-                    generate_btn = gr.Button("🎲 Generate Training Sample", variant="primary")
-
-                    training_image = gr.Image(label="Training Sample")
-
-                with gr.Column():
-                    training_instructions = gr.Textbox(label="Instructions & Hints", lines=10)
-
-                    user_answer = gr.Radio(
-                        choices=["Real", "Fake"],
-                        label="Your Answer",
-                        value=None
-                    )
-
-                    submit_answer_btn = gr.Button("✅ Submit Answer", variant="secondary")
-                    training_result = gr.Textbox(label="Results", lines=8)
-
-            generate_btn.click(
-                generate_training_sample,
-                inputs=[difficulty_dropdown],
-                outputs=[training_image, training_instructions, training_result]
-            )
-
-            submit_answer_btn.click(
-                check_training_answer,
-                inputs=[user_answer],
-                outputs=[training_result]
-            )
-
-        # Education Tab
-        with gr.TabItem("📚 Education & Tips"):
-            gr.Markdown("Learn how to identify deepfakes and protect yourself from misinformation")
+def build_interface():
+    """Create the Gradio interface"""
+    import gradio as gr
+
+    with gr.Blocks(title="Deepfake Immunization Toolkit", theme=gr.themes.Soft()) as demo:
+        gr.Markdown("""
+        # 🛡️ Deepfake Immunization Toolkit
+
+        **Advanced AI-powered system for deepfake detection, user training, and content verification**
+
+        This toolkit combines machine learning, federated learning, and blockchain technology to help users identify and combat synthetic media.
+        """)
+
+        with gr.Tabs():
+            # Main Detection Tab
+            with gr.TabItem("🔍 Deepfake Detection"):
+                gr.Markdown("Upload an image to analyze for deepfake indicators")
+
+                with gr.Row():
+                    with gr.Column():
+                        input_image = gr.Image(type="numpy", label="Upload Image for Analysis")
+                        analyze_btn = gr.Button("🔍 Analyze Image", variant="primary")
+
+                    with gr.Column():
+                        detection_output = gr.Textbox(label="Detection Results", lines=10)
+                        verification_output = gr.Textbox(label="Blockchain Verification", lines=6)
+                        recommendation_output = gr.Textbox(label="Recommendation", lines=3)
+                        status_output = gr.Textbox(label="Status", lines=1)
+
+                analyze_btn.click(
+                    analyze_image_async,
+                    inputs=[input_image],
+                    outputs=[detection_output, verification_output, recommendation_output, status_output],
+                    # The analysis service applies its own queue limit, and concurrent
+                    # uploads need to reach the batcher together
+                    concurrency_limit=None
+                )
+
+            # Video Detection Tab
+            with gr.TabItem("🎬 Video Analysis"):
+                gr.Markdown("Upload a video to analyze sampled frames for deepfake indicators")
+
+                with gr.Row():
+                    with gr.Column():
+                        input_video = gr.Video(label="Upload Video for Analysis")
+                        analyze_video_btn = gr.Button("🎬 Analyze Video", variant="primary")
+
+                    with gr.Column():
+                        video_output = gr.Textbox(label="Video Analysis Results", lines=18)
+
+                analyze_video_btn.click(
+                    analyze_video,
+                    inputs=[input_video],
+                    outputs=[video_output]
+                )
+
+            # Training Tab
+            with gr.TabItem("🎯 Training Mode"):
+                gr.Markdown("Practice identifying deepfakes with AI-generated examples")
+
+                with gr.Row():
+                    with gr.Column():
+                        difficulty_dropdown = gr.Dropdown(
+                            choices=["Easy", "Medium", "Hard"],
+                            value="Medium",
+                            label="Difficulty Level"
+                        )
+                        generate_btn = gr.Button("🎲 Generate Training Sample", variant="primary")
+
+                        training_image = gr.Image(label="Training Sample")
+
+                    with gr.Column():
+                        training_instructions = gr.Textbox(label="Instructions & Hints", lines=10)
+
+                        user_answer = gr.Radio(
+                            choices=["Real", "Fake"],
+                            label="Your Answer",
+                            value=None
+                        )
+
+                        submit_answer_btn = gr.Button("✅ Submit Answer", variant="secondary")
+                        training_result = gr.Textbox(label="Results", lines=8)
+
+                generate_btn.click(
+                    generate_training_sample,
+                    inputs=[difficulty_dropdown],
+                    outputs=[training_image, training_instructions, training_result]
+                )
+
+                submit_answer_btn.click(
+                    check_training_answer,
+                    inputs=[user_answer],
+                    outputs=[training_result]
+                )
+
+            # Education Tab
+            with gr.TabItem("📚 Education & Tips"):
+                gr.Markdown("Learn how to identify deepfakes and protect yourself from misinformation")
+
+                tips_btn = gr.Button("📖 Show Detection Tips", variant="primary")
+                tips_output = gr.Textbox(label="Detection Tips & Best Practices", lines=25)
+
+                tips_btn.click(
+                    get_detection_tips,
+                    outputs=[tips_output]
+                )
+
+                gr.Markdown("""
+                ## 🔗 Additional Resources
+
+                **Understanding Deepfakes:**
+                - Deepfakes use AI to create realistic but fake videos and images
+                - They can be used for misinformation, fraud, and harassment
+                - Detection technology is constantly evolving
+
+                **Staying Safe:**
+                - Always verify important information from multiple sources
+                - Be especially cautious during election periods
+                - Report suspicious content to relevant platforms
+                - Stay informed about the latest deepfake detection techniques
+
+                **Technical Details:**
+                - This toolkit uses convolutional neural networks for detection
+                - Federated learning ensures privacy while improving the model
+                - Blockchain provides immutable content verification
+                """)
+
+            # System Info Tab
+            with gr.TabItem("⚙️ System Info"):
+                gr.Markdown("System status and technical information")
+
+                gr.Markdown(f"""
+                ## 🔧 System Status
+
+                **Model Information:**
+                - Detection Model: Enhanced CNN with heuristic analysis
+                - Training Status: Initialized with synthetic data
+                - Federated Learning: Ready for client updates
+                - Blockchain: Active with genesis block
+
+                **Capabilities:**
+                - Real-time deepfake detection
+                - User training and education
+                - Content authenticity verification
+                - Privacy-preserving federated learning
+
+                **Performance Metrics:**
+                - Model Accuracy: ~85% (estimated on synthetic data)
+                - Processing Time: < 2 seconds per image
+                - Blockchain Verification: < 1 second
+                - Measure on this machine with `python deepfake_immunization__toolkit.py benchmark`
+
+                **Privacy Features:**
+                - No user data stored permanently
+                - Federated learning preserves privacy
+                - Blockchain ensures content integrity
+                """)
+
+    return demo
+
+def iter_scan_sources(source, skip=0):
+    """Yield (key, path or bytes) for images in a directory, tar/zip archive or newline-separated file list
+
+    Items come in a stable order so a scan can resume by position; the
+    first `skip` items are passed over without reading their data.
+    Directory and list entries are yielded as paths so decode threads
+    also do the file reads, while archive members are read here in order.
+    """
+    position = 0
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for filename in sorted(files):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    position += 1
+                    if position > skip:
+                        yield os.path.join(root, filename), os.path.join(root, filename)
+    elif tarfile.is_tarfile(source):
+        # Stream mode reads members sequentially, which also suits compressed tars
+        with tarfile.open(source, 'r|*') as archive:
+            for member in archive:
+                if member.isfile() and member.name.lower().endswith(IMAGE_EXTENSIONS):
+                    position += 1
+                    if position > skip:
+                        yield f"{source}:{member.name}", archive.extractfile(member).read()
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for name in archive.namelist():
+                if not name.endswith('/') and name.lower().endswith(IMAGE_EXTENSIONS):
+                    position += 1
+                    if position > skip:
+                        yield f"{source}:{name}", archive.read(name)
+    else:
+        with open(source) as f:
+            for line in f:
+                path = line.strip()
+                if path:
+                    position += 1
+                    if position > skip:
+                        yield path, path
+
+def _decode_scan_item(item, hash_algorithm, max_side=None):
+    """Decode one scan item to an RGB array and hash its pixels like the upload path does
+
+    With max_side the hashed full-resolution pixels are then shrunk so
+    neither side exceeds it. The model and heuristics resize to a square
+    anyway, so capping each axis separately leaves their inputs unchanged.
+    """
+    key, data = item
+    try:
+        with Image.open(data if isinstance(data, str) else BytesIO(data)) as image:
+            pixels = np.asarray(image.convert('RGB'))
+    except Exception as e:
+        return key, None, None, None, str(e)
+    content_hash, content_size, _ = hash_content(pixels, hash_algorithm)
+    if max_side is not None:
+        height, width = pixels.shape[:2]
+        if height > max_side or width > max_side:
+            size = (min(width, max_side), min(height, max_side))
+            pixels = cv2.resize(pixels, size, interpolation=cv2.INTER_AREA)
+    return key, pixels, content_hash, content_size, None
+
+class BulkScanner:
+    """Offline corpus scan: threaded decoding, batched detection and bulk registry writes
+
+    Rows are buffered and, every checkpoint_every images, their new content
+    is registered as one Merkle batch block, appended to the JSONL output
+    (plus one Parquet part file when pyarrow is installed) and recorded in
+    a checkpoint file. An interrupted scan resumes from the last checkpoint,
+    discarding any output written after it.
+
+    Without tiled inference only downscaled copies are kept once an image is
+    hashed, so prefetched batches hold small arrays however large the files.
+    """
 
-            tips_btn = gr.Button("📖 Show Detection Tips", variant="primary")
-            tips_output = gr.Textbox(label="Detection Tips & Best Practices", lines=25)
+    FIELDS = ('key', 'content_hash', 'size', 'is_deepfake', 'confidence', 'fake_probability',
+              'heuristic_score', 'stage', 'registration', 'error')
+
+    def __init__(self, toolkit, output_path, batch_size=32, decode_workers=None, prefetch_batches=2,
+                 checkpoint_every=1024, parquet=False, register=True):
+        if parquet and pyarrow is None:
+            raise ValueError("Parquet output requires pyarrow")
+        self.toolkit = toolkit
+        self.output_path = output_path
+        self.checkpoint_path = output_path + '.checkpoint'
+        self.batch_size = batch_size
+        self.decode_workers = decode_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.prefetch_batches = prefetch_batches
+        self.checkpoint_every = checkpoint_every
+        self.parquet = parquet
+        self.register = register
+
+        self.rows = []
+        self.registrations = []
+        self.pending_hashes = set()
+        self.state = None
+
+    def _load_state(self, source):
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                state = json.load(f)
+            if state['source'] != source:
+                raise ValueError(f"Checkpoint {self.checkpoint_path} belongs to a scan of {state['source']}")
+            return state
+        return {'source': source, 'processed': 0, 'output_bytes': 0, 'parquet_parts': 0,
+                'images': 0, 'errors': 0, 'flagged': 0}
+
+    def _save_state(self):
+        temporary_path = self.checkpoint_path + '.tmp'
+        with open(temporary_path, 'w') as f:
+            json.dump(self.state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def run(self, source):
+        """Scan every image in source and return the final checkpoint state"""
+        self.state = self._load_state(source)
+        started = time.time()
+        scanned = 0
+
+        # Drop rows written after the last checkpoint; they are about to be rescanned
+        with open(self.output_path, 'ab') as f:
+            f.truncate(self.state['output_bytes'])
+
+        items = iter_scan_sources(source, skip=self.state['processed'])
+        hash_algorithm = self.toolkit.blockchain.hash_algorithm
+        engine = self.toolkit.engine
+        # Tiles are cut from full-resolution pixels, so only untiled scans can shrink images early
+        max_side = None if engine.max_tiles else max(engine.preprocessor.size, engine.heuristics.analysis_size)
+        with open(self.output_path, 'ab') as output, ThreadPoolExecutor(self.decode_workers) as pool:
+            # Decode the next batches while the current one runs through the detector
+            in_flight = []
+            while True:
+                batch = list(itertools.islice(items, self.batch_size))
+                if batch:
+                    in_flight.append([pool.submit(_decode_scan_item, item, hash_algorithm, max_side) for item in batch])
+                if not in_flight:
+                    break
+                if batch and len(in_flight) <= self.prefetch_batches:
+                    continue
+
+                decoded = [future.result() for future in in_flight.pop(0)]
+                self._process(decoded)
+                scanned += len(decoded)
+                if len(self.rows) >= self.checkpoint_every:
+                    self._flush(output)
+            self._flush(output)
+
+        elapsed = time.time() - started
+        return dict(self.state, elapsed_seconds=elapsed, images_per_second=scanned / elapsed if elapsed else 0)
+
+    def _process(self, decoded):
+        images = [pixels for _, pixels, _, _, error in decoded if error is None]
+        with metrics.span('scan_detect'):
+            results = iter(self.toolkit.detect_deepfake_batch(images) if images else [])
+
+        for key, pixels, content_hash, content_size, error in decoded:
+            if error is not None:
+                self.rows.append({'key': key, 'error': error})
+                self.state['errors'] += 1
+                continue
+
+            result = next(results)
+            row = {
+                'key': key,
+                'content_hash': content_hash,
+                'size': content_size,
+                'is_deepfake': result['is_deepfake'],
+                'confidence': result['confidence'],
+                'fake_probability': result['probabilities']['fake'],
+                'heuristic_score': result.get('heuristic_score'),
+                'stage': result.get('stage'),
+                'error': result.get('error')
+            }
+            if self.register:
+                # Content repeated within one flush is only pending, not yet on the chain
+                is_registered = (content_hash in self.pending_hashes
+                                 or self.toolkit.blockchain.verify_content(content_hash)[0])
+                row['registration'] = 'existing' if is_registered else 'new'
+                if not is_registered:
+                    self.pending_hashes.add(content_hash)
+                    self.registrations.append({
+                        'content_hash': content_hash,
+                        'timestamp': datetime.now().isoformat(),
+                        'verification_status': 'scanned',
+                        'metadata': {
+                            'size': content_size,
+                            'format': self.toolkit._content_format(pixels),
+                            'hash_algorithm': self.toolkit.blockchain.hash_algorithm,
+                            'source': key,
+                            'is_deepfake': result['is_deepfake']
+                        }
+                    })
+            self.rows.append(row)
+            self.state['images'] += 1
+            self.state['flagged'] += int(result['is_deepfake'])
+
+    def _flush(self, output):
+        if not self.rows:
+            return
 
-            tips_btn.click(
-                get_detection_tips,
-                outputs=[tips_output]
+        # Registry first: a crash before the checkpoint rescans these rows, and
+        # register_batch skips the content that already made it onto the chain
+        if self.registrations:
+            with metrics.span('scan_register'):
+                self.toolkit.blockchain.register_batch(self.registrations)
+                if isinstance(self.toolkit.blockchain.chain, BlockLedger):
+                    self.toolkit.blockchain.chain.sync()
+            self.registrations = []
+            self.pending_hashes = set()
+
+        output.write(b''.join(json.dumps(row).encode('utf-8') + b'\n' for row in self.rows))
+        output.flush()
+        os.fsync(output.fileno())
+
+        if self.parquet:
+            part_path = f"{os.path.splitext(self.output_path)[0]}.part{self.state['parquet_parts']:05d}.parquet"
+            table = pyarrow.table({field: [row.get(field) for row in self.rows] for field in self.FIELDS})
+            pyarrow.parquet.write_table(table, part_path)
+            self.state['parquet_parts'] += 1
+
+        self.state['processed'] += len(self.rows)
+        self.state['output_bytes'] = output.tell()
+        self._save_state()
+        self.rows = []
+
+def _time_calls(function, repeats, warmup=1):
+    """Run a function repeatedly and summarise its latency in milliseconds"""
+    for _ in range(warmup):
+        function()
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'iterations': repeats,
+        'mean_ms': sum(timings) / repeats,
+        'p50_ms': timings[repeats // 2],
+        'p95_ms': timings[min(repeats - 1, int(repeats * 0.95))],
+        'min_ms': timings[0]
+    }
+
+class BenchmarkSuite:
+    """Reproducible latency benchmarks for the detection, verification and training paths"""
+
+    RESOLUTIONS = {'224': (224, 224), '1080p': (1080, 1920), '4k': (2160, 3840)}
+
+    def __init__(self, repeats=10, batch_sizes=(1, 4, 16), model_resolutions=(224, 448),
+                 chain_lengths=(10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6), client_counts=(1, 10, 50), seed=0):
+        self.repeats = repeats
+        self.batch_sizes = batch_sizes
+        self.model_resolutions = model_resolutions
+        self.chain_lengths = chain_lengths
+        self.client_counts = client_counts
+        self.random = np.random.default_rng(seed)
+        torch.manual_seed(seed)
+
+        self.detector = DeepfakeDetector().eval()
+        self.engine = DetectionEngine(self.detector)
+        self.results = []
+
+    def _image(self, resolution):
+        height, width = self.RESOLUTIONS[resolution]
+        return self.random.integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+    def _record(self, name, params, stats, items=1):
+        stats['items_per_second'] = items * 1000 / stats['mean_ms'] if stats['mean_ms'] else 0
+        self.results.append({'name': name, 'params': params, **stats})
+        print(f"{name} {params}: {stats['mean_ms']:.3f} ms mean, {stats['p95_ms']:.3f} ms p95", file=sys.stderr)
+
+    def bench_preprocess(self):
+        for resolution in self.RESOLUTIONS:
+            image = self._image(resolution)
+            stats = _time_calls(lambda: self.engine.preprocessor.preprocess_batch([image]), self.repeats)
+            self._record('preprocess_image', {'resolution': resolution}, stats)
+
+    def bench_forward(self):
+        for size in self.model_resolutions:
+            for batch_size in self.batch_sizes:
+                batch = torch.randn(batch_size, 3, size, size)
+
+                def forward():
+                    with torch.no_grad():
+                        self.detector(batch)
+                self._record('detector_forward', {'batch_size': batch_size, 'resolution': size},
+                             _time_calls(forward, self.repeats), items=batch_size)
+
+    def bench_heuristics(self):
+        for resolution in self.RESOLUTIONS:
+            image = self._image(resolution)
+            stats = _time_calls(lambda: self.engine.heuristic_scores([image]), self.repeats)
+            self._record('heuristic_analysis', {'resolution': resolution}, stats)
+
+    def bench_tiled_detection(self):
+        for resolution in self.RESOLUTIONS:
+            image = self._image(resolution)
+            for max_tiles in (0, 4, 8):
+                engine = DetectionEngine(self.detector, self.engine.preprocessor, self.engine.heuristics, max_tiles)
+                stats = _time_calls(lambda: engine.detect_batch([image]), self.repeats)
+                self._record('tiled_detection', {'resolution': resolution, 'max_tiles': max_tiles}, stats)
+
+    def bench_inference_modes(self):
+        batches = [torch.randn(4, 3, 224, 224) for _ in range(2)]
+        for mode in INFERENCE_MODES:
+            for compiler in (None, 'torchscript'):
+                model = build_inference_model(self.detector, mode, batches, compiler=compiler)
+                report = compare_inference_models(self.detector, model, batches, repeats=1)
+
+                def forward():
+                    with torch.no_grad():
+                        model(batches[0])
+                stats = _time_calls(forward, self.repeats)
+                stats['prediction_agreement'] = report['prediction_agreement']
+                self._record('inference_mode', {'mode': mode, 'compiler': compiler}, stats, items=batches[0].size(0))
+
+    def bench_verify_content(self):
+        for chain_length in self.chain_lengths:
+            blockchain = SimpleBlockchain()
+            # Synthetic blocks: verify_content only depends on the index, not on valid links
+            blockchain.load_chain(
+                {'index': i, 'timestamp': 0, 'data': {'content_hash': f"{i:064x}"}, 'previous_hash': '', 'hash': ''}
+                for i in range(chain_length)
             )
+            probes = [f"{i:064x}" for i in self.random.integers(0, chain_length, 1000)]
+            probes += [f"missing{i}" for i in range(1000)]
+
+            def verify_all():
+                for content_hash in probes:
+                    blockchain.verify_content(content_hash)
+            self._record('verify_content', {'chain_length': chain_length},
+                         _time_calls(verify_all, self.repeats), items=len(probes))
+
+    def bench_aggregate_updates(self):
+        base_state = self.detector.state_dict()
+        for client_count in self.client_counts:
+            updates = [
+                {name: tensor + 0.01 * torch.randn_like(tensor) if tensor.is_floating_point() else tensor
+                 for name, tensor in base_state.items()}
+                for _ in range(client_count)
+            ]
+
+            # Built once: model init and layout are not part of what is being measured, and
+            # aggregate_updates() resets the running sums between repeats
+            federated_learning = FederatedLearning(copy.deepcopy(self.detector))
+
+            def aggregate():
+                for update in updates:
+                    federated_learning.add_client_update(update, 10)
+                federated_learning.aggregate_updates()
+            self._record('aggregate_updates', {'clients': client_count},
+                         _time_calls(aggregate, max(1, self.repeats // 2)), items=client_count)
+
+    def run(self):
+        self.bench_preprocess()
+        self.bench_forward()
+        self.bench_heuristics()
+        self.bench_tiled_detection()
+        self.bench_inference_modes()
+        self.bench_verify_content()
+        self.bench_aggregate_updates()
+        return {
+            'environment': {
+                'timestamp': datetime.now().isoformat(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'torch': torch.__version__,
+                'torch_threads': torch.get_num_threads(),
+                'numpy': np.__version__,
+                'opencv': cv2.__version__
+            },
+            'results': self.results
+        }
 
-            gr.Markdown("""
-            ## 🔗 Additional Resources
-
-            **Understanding Deepfakes:**
-            - Deepfakes use AI to create realistic but fake videos and images
-            - They can be used for misinformation, fraud, and harassment
-            - Detection technology is constantly evolving
-
-            **Staying Safe:**
-            - Always verify important information from multiple sources
-            - Be especially cautious during election periods
-            - Report suspicious content to relevant platforms
-            - Stay informed about the latest deepfake detection techniques
-
-            **Technical Details:**
-            - This toolkit uses convolutional neural networks for detection
-            - Federated learning ensures privacy while improving the model
-            - Blockchain provides immutable content verification
-            """)
-
-        # System Info Tab
-        with gr.TabItem("⚙️ System Info"):
-            gr.Markdown("System status and technical information")
-
-            gr.Markdown(f"""
-            ## 🔧 System Status
-
-            **Model Information:**
-            - Detection Model: Enhanced CNN with heuristic analysis
-            - Training Status: Initialized with synthetic data
-            - Federated Learning: Ready for client updates
-            - Blockchain: Active with genesis block
-
-            **Capabilities:**
-            - Real-time deepfake detection
-            - User training and education
-            - Content authenticity verification
-            - Privacy-preserving federated learning
-
-            **Performance Metrics:**
-            - Model Accuracy: ~85% (estimated on synthetic data)
-            - Processing Time: < 2 seconds per image
-            - Blockchain Verification: < 1 second
-
-            **Privacy Features:**
-            - No user data stored permanently
-            - Federated learning preserves privacy
-            - Blockchain ensures content integrity
-            """)
-
-# Launch the application
-if __name__ == "__main__":
+def launch_interface():
+    """Launch the Gradio web interface"""
     print("🚀 Launching Deepfake Immunization Toolkit...")
     print("📊 System initialized successfully!")
     print("🔗 Access the web interface through the provided URL")
 
     # Launch with share=True for public access
+    demo = build_interface()
     demo.launch(
         share=True,
         debug=True,
         show_error=True,
         server_name="0.0.0.0",
         server_port=7860
-    )
\ No newline at end of file
+    )
+
+def run_simulation(args):
+    """Run a federated learning simulation and print its JSON report"""
+    simulation = FederatedSimulation(
+        num_clients=args.clients,
+        clients_per_round=args.clients_per_round,
+        rounds=args.rounds,
+        workers=args.workers,
+        samples_per_client=args.samples_per_client,
+        image_size=args.image_size,
+        local_epochs=args.local_epochs,
+        topk_ratio=args.topk_ratio,
+        mode=args.mode
+    )
+    report = simulation.run()
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+def run_benchmark(args):
+    """Run the benchmark suite and write its JSON results"""
+    if args.quick:
+        suite = BenchmarkSuite(repeats=3, batch_sizes=(1, 4), model_resolutions=(224,),
+                               chain_lengths=(10 ** 3, 10 ** 4), client_counts=(1, 4))
+    else:
+        suite = BenchmarkSuite(repeats=args.repeats, chain_lengths=tuple(args.chain_lengths))
+    results = suite.run()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+
+def load_labeled_images(directory, max_side=1024):
+    """Load images from directory/real and directory/fake as (images, labels) with 1 for fake"""
+    images, labels = [], []
+    for label, name in ((0, 'real'), (1, 'fake')):
+        folder = os.path.join(directory, name)
+        for filename in sorted(os.listdir(folder)):
+            try:
+                with Image.open(os.path.join(folder, filename)) as image:
+                    image.draft('RGB', (max_side, max_side))
+                    image = image.convert('RGB')
+                    image.thumbnail((max_side, max_side))
+                    images.append(np.asarray(image))
+            except (OSError, ValueError):
+                continue
+            labels.append(label)
+    return images, labels
+
+def run_calibration(args):
+    """Calibrate cascade thresholds on a labeled directory and save them as JSON"""
+    images, labels = load_labeled_images(args.labeled_dir)
+    toolkit = DeepfakeImmunizationToolkit(checkpoint_path=DEFAULT_CHECKPOINT_PATH, max_tiles=args.max_tiles)
+    cascade = toolkit.calibrate_cascade(images, labels, args.max_error)
+    cascade.save(args.output)
+
+    # Replay the labeled set through the cascade to report pass-through and accuracy
+    results = toolkit.detect_deepfake_batch(images)
+    accuracy = np.mean([result['is_deepfake'] == bool(label) for result, label in zip(results, labels)])
+    report = toolkit.cascade_report()
+    report['images'] = len(images)
+    report['accuracy'] = float(accuracy)
+    print(json.dumps(report, indent=2))
+
+def run_scan(args):
+    """Scan a directory, archive or file list and write JSONL (and Parquet) results"""
+    toolkit = DeepfakeImmunizationToolkit(
+        ledger_path=args.ledger,
+        checkpoint_path=DEFAULT_CHECKPOINT_PATH,
+        hash_algorithm=args.hash_algorithm,
+        inference_mode=args.inference_mode,
+        max_tiles=args.max_tiles,
+        cascade=DetectionCascade.load(args.cascade) if args.cascade else None
+    )
+    scanner = BulkScanner(
+        toolkit,
+        args.output,
+        batch_size=args.batch_size,
+        decode_workers=args.decode_workers,
+        checkpoint_every=args.checkpoint_every,
+        parquet=args.parquet,
+        register=not args.no_register
+    )
+    try:
+        summary = scanner.run(args.source)
+    finally:
+        toolkit.blockchain.close()
+    summary['cascade'] = toolkit.cascade_report()
+    print(json.dumps(summary, indent=2))
+
+def run_pack(args):
+    """Pack a labeled image directory into training shards"""
+    prefixes = pack_image_shards(args.labeled_dir, args.output_dir, args.shard_size, args.image_size, args.workers)
+    print(json.dumps({'shards': len(prefixes), 'output_dir': args.output_dir}, indent=2))
+
+def run_training(args):
+    """Train the detector from packed shards and save it as the serving checkpoint"""
+    detector = DeepfakeDetector()
+    if os.path.exists(args.checkpoint):
+        # Fine-tune the current serving weights; an interrupted run resumes from its .partial weights instead
+        load_detector_checkpoint(detector, args.checkpoint, mmap=False)
+    trainer = DetectorTrainer(
+        detector,
+        find_image_shards(args.shard_dir),
+        epochs=args.epochs,
+        batch_size=args.batch_size,
+        num_workers=args.workers,
+        learning_rate=args.learning_rate,
+        precision=args.precision,
+        checkpoint_path=args.checkpoint,
+        checkpoint_every=args.checkpoint_every
+    )
+    print(json.dumps(trainer.run(), indent=2))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deepfake Immunization Toolkit")
+    subparsers = parser.add_subparsers(dest='command')
+
+    subparsers.add_parser('serve', help="Launch the web interface (default)")
+
+    simulate_parser = subparsers.add_parser('simulate', help="Benchmark federated aggregation with virtual clients")
+    simulate_parser.add_argument('--clients', type=int, default=100)
+    simulate_parser.add_argument('--clients-per-round', type=int, default=20)
+    simulate_parser.add_argument('--rounds', type=int, default=3)
+    simulate_parser.add_argument('--workers', type=int, default=None)
+    simulate_parser.add_argument('--samples-per-client', type=int, default=8)
+    simulate_parser.add_argument('--image-size', type=int, default=64)
+    simulate_parser.add_argument('--local-epochs', type=int, default=1)
+    simulate_parser.add_argument('--topk-ratio', type=float, default=None,
+                                 help="Send compressed top-k deltas instead of full state dicts")
+    simulate_parser.add_argument('--mode', choices=['sync', 'async'], default='sync')
+    simulate_parser.add_argument('--output', help="Also write the JSON report to this file")
+
+    benchmark_parser = subparsers.add_parser('benchmark', help="Measure detection, verification and training latency")
+    benchmark_parser.add_argument('--repeats', type=int, default=10)
+    benchmark_parser.add_argument('--chain-lengths', type=int, nargs='+', default=[10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6],
+                                  help="Chain sizes for verify_content (10000000 needs several GB of RAM)")
+    benchmark_parser.add_argument('--quick', action='store_true', help="Small sizes for a fast smoke run")
+    benchmark_parser.add_argument('--output', help="Write JSON results here instead of stdout")
+
+    calibrate_parser = subparsers.add_parser('calibrate', help="Fit early-exit cascade thresholds on labeled images")
+    calibrate_parser.add_argument('labeled_dir', help="Directory with real/ and fake/ subdirectories")
+    calibrate_parser.add_argument('--max-error', type=float, default=0.02,
+                                  help="Highest share of mislabeled images allowed among each stage's exits")
+    calibrate_parser.add_argument('--max-tiles', type=int, default=0,
+                                  help="Also calibrate escalation of ambiguous model verdicts to tiled inference")
+    calibrate_parser.add_argument('--output', default='cascade.json')
+
+    scan_parser = subparsers.add_parser('scan', help="Scan a directory, tar/zip archive or file list offline")
+    scan_parser.add_argument('source', help="Directory, .tar[.gz] or .zip archive, or a text file of image paths")
+    scan_parser.add_argument('--output', default='scan_results.jsonl',
+                             help="JSONL results; rerunning with the same output resumes from its checkpoint")
+    scan_parser.add_argument('--parquet', action='store_true', help="Also write Parquet part files (needs pyarrow)")
+    scan_parser.add_argument('--ledger', help="Registry ledger to register scanned content in")
+    scan_parser.add_argument('--no-register', action='store_true', help="Detect only, without registering content")
+    scan_parser.add_argument('--batch-size', type=int, default=32)
+    scan_parser.add_argument('--decode-workers', type=int, default=None)
+    scan_parser.add_argument('--checkpoint-every', type=int, default=1024)
+    scan_parser.add_argument('--hash-algorithm', choices=list(CONTENT_HASH_ALGORITHMS), default='sha256')
+    scan_parser.add_argument('--inference-mode', choices=INFERENCE_MODES, default='fp32')
+    scan_parser.add_argument('--max-tiles', type=int, default=0)
+    scan_parser.add_argument('--cascade', help="Cascade thresholds written by the calibrate command")
+
+    pack_parser = subparsers.add_parser('pack', help="Pack labeled images into memory-mapped training shards")
+    pack_parser.add_argument('labeled_dir', help="Directory with real/ and fake/ subdirectories")
+    pack_parser.add_argument('output_dir')
+    pack_parser.add_argument('--shard-size', type=int, default=4096)
+    pack_parser.add_argument('--image-size', type=int, default=224)
+    pack_parser.add_argument('--workers', type=int, default=None)
+
+    train_parser = subparsers.add_parser('train', help="Train the detector from packed shards")
+    train_parser.add_argument('shard_dir')
+    train_parser.add_argument('--epochs', type=int, default=1)
+    train_parser.add_argument('--batch-size', type=int, default=64)
+    train_parser.add_argument('--workers', type=int, default=None, help="DataLoader workers (at most one per shard)")
+    train_parser.add_argument('--learning-rate', type=float, default=0.001)
+    train_parser.add_argument('--precision', choices=['bf16', 'fp32'], default='bf16')
+    train_parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT_PATH,
+                              help="Serving checkpoint, replaced once training finishes; "
+                                   "an interrupted run resumes from <checkpoint>.partial")
+    train_parser.add_argument('--checkpoint-every', type=int, default=500)
+
+    args = parser.parse_args(argv)
+    if args.command == 'simulate':
+        run_simulation(args)
+    elif args.command == 'benchmark':
+        run_benchmark(args)
+    elif args.command == 'calibrate':
+        run_calibration(args)
+    elif args.command == 'scan':
+        run_scan(args)
+    elif args.command == 'pack':
+        run_pack(args)
+    elif args.command == 'train':
+        run_training(args)
+    else:
+        launch_interface()
+
+# Launch the application
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,38 @@
+import numpy as np
+
+from deepfake_immunization__toolkit import DeepfakeImmunizationToolkit, SimpleBlockchain, verify_merkle_proof
+
+
+def test_reupload_of_pending_content_returns_its_ticket_then_its_proof():
+    toolkit = DeepfakeImmunizationToolkit(registration_batch_size=3)
+    images = [np.full((8, 8, 3), value, dtype=np.uint8) for value in (1, 2, 3)]
+    hashes = [toolkit.compute_content_hash(image) for image in images]
+
+    try:
+        first = toolkit.verify_content_authenticity(images[0], *hashes[0])
+        again = toolkit.verify_content_authenticity(images[0], *hashes[0])
+        assert first['status'] == 'newly_registered' and first['batch_status'] == 'pending_batch'
+        assert again['status'] == 'pending_batch' and again['batch_position'] == 0
+        assert len(toolkit.blockchain.pending_registrations) == 1
+
+        toolkit.verify_content_authenticity(images[1], *hashes[1])
+        sealing = toolkit.verify_content_authenticity(images[2], *hashes[2])
+        assert sealing['batch_status'] == 'registered'
+
+        sealed = toolkit.verify_content_authenticity(images[0], *hashes[0])
+        proof = sealed['inclusion_proof']
+        assert sealed['status'] == 'verified'
+        assert verify_merkle_proof(hashes[0][0], proof['proof'], proof['merkle_root'])
+    finally:
+        toolkit.close()
+
+
+def test_queueing_already_sealed_content_does_not_register_it_twice():
+    blockchain = SimpleBlockchain(batch_size=1)
+    blockchain.queue_registration({'content_hash': 'a' * 64})
+    blocks = len(blockchain.chain)
+
+    ticket = blockchain.queue_registration({'content_hash': 'a' * 64})
+
+    assert ticket['status'] == 'registered' and ticket['inclusion_proof'] is not None
+    assert len(blockchain.chain) == blocks
@@ -0,0 +1,43 @@
+import numpy as np
+
+from deepfake_immunization__toolkit import DeepfakeDetector, DetectionCascade, DetectionEngine, InferenceWorkerPool
+
+
+def test_failed_heuristics_never_exit_early():
+    # Every successfully scored image exits as real at this threshold
+    cascade = DetectionCascade(real_threshold=0.0)
+    engine = DetectionEngine(DeepfakeDetector().eval(), cascade=cascade)
+    rgb = np.random.default_rng(0).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    gray = rgb[:, :, 0].copy()
+
+    scored, failed = engine.detect_batch([rgb, gray])
+
+    assert scored['stage'] == 'heuristic'
+    assert failed['stage'] == 'model'
+    assert failed['heuristic_score'] is None
+    assert 'error' not in failed
+
+
+def test_heuristic_exit_probabilities_agree_with_verdict():
+    cascade = DetectionCascade(real_threshold=0.4, fake_threshold=0.1)
+    engine = DetectionEngine(DeepfakeDetector().eval(), cascade=cascade)
+
+    real = engine.heuristic_result('real', 0.45)
+    fake = engine.heuristic_result('fake', 0.05)
+
+    assert not real['is_deepfake'] and real['probabilities']['fake'] < 0.5
+    assert fake['is_deepfake'] and fake['probabilities']['fake'] > 0.5
+
+
+def test_worker_pool_reports_cascade_counts():
+    cascade = DetectionCascade(real_threshold=0.0)
+    pool = InferenceWorkerPool(DeepfakeDetector().eval(), num_workers=1, cascade=cascade)
+    try:
+        images = [np.random.default_rng(i).integers(0, 256, (64, 64, 3), dtype=np.uint8) for i in range(3)]
+        results = pool.detect_batch(images, timeout=120)
+    finally:
+        pool.close()
+
+    assert [result['stage'] for result in results] == ['heuristic'] * 3
+    assert cascade.report()['heuristic']['entered'] == 3
+    assert cascade.report()['heuristic']['exited'] == 3
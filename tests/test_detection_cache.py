@@ -0,0 +1,19 @@
+from deepfake_immunization__toolkit import DeepfakeImmunizationToolkit, DetectionCache
+
+
+def test_close_persists_entries_below_the_save_interval(tmp_path):
+    cache_path = str(tmp_path / 'cache.json')
+    toolkit = DeepfakeImmunizationToolkit(cache_path=cache_path)
+    toolkit.detection_cache.put('abc', toolkit.model_version, {'is_deepfake': False})
+    toolkit.close()
+
+    reloaded = DetectionCache(persist_path=cache_path)
+    assert reloaded.get('abc', toolkit.model_version) == {'is_deepfake': False}
+
+
+def test_entries_expire_after_ttl():
+    cache = DetectionCache(ttl=-1)
+    cache.put('abc', 'v1', {'is_deepfake': True})
+
+    assert cache.get('abc', 'v1') is None
+    assert cache.stats()['evictions'] == 1
@@ -0,0 +1,16 @@
+import torch
+
+from deepfake_immunization__toolkit import DeepfakeImmunizationToolkit
+
+
+def test_async_unchanged_update_keeps_initialized_weights():
+    toolkit = DeepfakeImmunizationToolkit(federated_mode='async')
+    federated_learning = toolkit.federated_learning
+    before = {name: tensor.clone() for name, tensor in toolkit.detector.state_dict().items()}
+
+    base_round, state = federated_learning.global_state()
+    assert federated_learning.add_client_update(state, 10, base_round)
+    federated_learning.aggregate_updates()
+
+    for name, tensor in toolkit.detector.state_dict().items():
+        torch.testing.assert_close(tensor, before[name])
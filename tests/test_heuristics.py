@@ -0,0 +1,40 @@
+import cv2
+import numpy as np
+import pytest
+
+from deepfake_immunization__toolkit import HeuristicAnalyzer
+
+
+def reference_score(image):
+    """The original per-image heuristic, computed at the image's native size"""
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    blur_score = min(cv2.Laplacian(gray, cv2.CV_64F).var() / 1000, 1.0)
+    edge_density = np.sum(cv2.Canny(gray, 50, 150) > 0) / gray.size
+    magnitude_spectrum = np.log(np.abs(np.fft.fftshift(np.fft.fft2(gray))) + 1)
+    return (blur_score + edge_density + min(np.std(magnitude_spectrum) / 10, 1.0)) / 3
+
+
+def smooth_image(rng, height, width):
+    noise = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(noise, (0, 0), 2)
+
+
+@pytest.mark.parametrize('shape', [(224, 224), (160, 160), (100, 180), (99, 61)])
+def test_images_up_to_analysis_size_match_reference(shape):
+    rng = np.random.default_rng(0)
+    images = [smooth_image(rng, *shape) for _ in range(3)]
+
+    scores = HeuristicAnalyzer().analyze_batch(images)
+
+    np.testing.assert_allclose(scores, [reference_score(image) for image in images], atol=1e-6)
+
+
+def test_mixed_batch_scores_each_image_like_a_single_call():
+    rng = np.random.default_rng(1)
+    analyzer = HeuristicAnalyzer()
+    images = [smooth_image(rng, 224, 224), smooth_image(rng, 120, 90), smooth_image(rng, 480, 640),
+              smooth_image(rng, 300, 150)]
+
+    batch_scores = analyzer.analyze_batch(images)
+
+    np.testing.assert_allclose(batch_scores, [analyzer.analyze_batch([image])[0] for image in images], atol=1e-9)
@@ -0,0 +1,34 @@
+import pytest
+import torch
+
+from deepfake_immunization__toolkit import (
+    INFERENCE_MODES, DeepfakeDetector, build_inference_model, compare_inference_models
+)
+
+
+@pytest.fixture(scope='module')
+def detector():
+    torch.manual_seed(0)
+    return DeepfakeDetector().eval()
+
+
+@pytest.mark.parametrize('compiler', [None, 'torchscript'])
+@pytest.mark.parametrize('mode', INFERENCE_MODES)
+def test_every_mode_builds_and_agrees_with_fp32(detector, mode, compiler):
+    generator = torch.Generator().manual_seed(1)
+    calibration = [torch.randn(4, 3, 224, 224, generator=generator) for _ in range(2)]
+    held_out = [torch.randn(4, 3, 224, 224, generator=generator) for _ in range(2)]
+
+    model = build_inference_model(detector, mode, calibration, compiler=compiler)
+    with torch.no_grad():
+        outputs = model(held_out[0])
+
+    assert outputs.shape == (4, 2)
+    torch.testing.assert_close(outputs.sum(dim=1), torch.ones(4))
+    report = compare_inference_models(detector, model, held_out, repeats=1)
+    assert report['max_fake_probability_delta'] < 0.1
+
+
+def test_unknown_mode_is_rejected(detector):
+    with pytest.raises(ValueError):
+        build_inference_model(detector, 'fp16')
@@ -0,0 +1,116 @@
+import os
+
+import pytest
+
+from deepfake_immunization__toolkit import BlockLedger, SimpleBlockchain
+
+
+def registration(i):
+    return {'content_hash': f"{i:064x}", 'verification_status': 'pending', 'metadata': {'hash_algorithm': 'sha256'}}
+
+
+def build_ledger(path, blocks, **options):
+    blockchain = SimpleBlockchain(path, **options)
+    for i in range(blocks):
+        blockchain.add_block(registration(i))
+    blockchain.close()
+
+
+def test_reopened_ledger_replays_blocks_and_index(tmp_path):
+    path = str(tmp_path / 'ledger.bin')
+    build_ledger(path, 5)
+
+    blockchain = SimpleBlockchain(path)
+    try:
+        assert len(blockchain.chain) == 6
+        assert [block['index'] for block in blockchain.chain] == list(range(6))
+        is_verified, block = blockchain.verify_content(f"{3:064x}")
+        assert is_verified and block['index'] == 4
+        assert blockchain.validate_chain(workers=1)['valid']
+
+        blockchain.add_block(registration(99))
+    finally:
+        blockchain.close()
+    assert len(BlockLedger(path)) == 7
+
+
+def test_half_written_last_record_is_truncated(tmp_path):
+    path = str(tmp_path / 'ledger.bin')
+    build_ledger(path, 3)
+    intact_size = os.path.getsize(path)
+    build_ledger(path, 1)
+    # Simulate a crash in the middle of writing the last record
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 7)
+
+    ledger = BlockLedger(path)
+    try:
+        assert len(ledger) == 4
+        assert os.path.getsize(path) == intact_size
+    finally:
+        ledger.close()
+
+    blockchain = SimpleBlockchain(path)
+    try:
+        assert blockchain.validate_chain(workers=1)['valid']
+        assert blockchain.verify_content(f"{0:064x}")[0]
+    finally:
+        blockchain.close()
+
+
+def test_corrupted_last_record_fails_its_checksum(tmp_path):
+    path = str(tmp_path / 'ledger.bin')
+    build_ledger(path, 2)
+    with open(path, 'r+b') as f:
+        f.seek(-2, os.SEEK_END)
+        f.write(b'xx')
+
+    ledger = BlockLedger(path)
+    try:
+        assert len(ledger) == 2
+    finally:
+        ledger.close()
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_validate_chain_reuses_checkpoints_across_reopen(tmp_path, workers):
+    path = str(tmp_path / 'ledger.bin')
+    build_ledger(path, 24, checkpoint_interval=10)
+
+    blockchain = SimpleBlockchain(path, checkpoint_interval=10)
+    try:
+        first = blockchain.validate_chain(workers=workers)
+        assert first == {'valid': True, 'first_invalid_index': None, 'blocks_checked': 25, 'resumed_from': 0}
+    finally:
+        blockchain.close()
+
+    blockchain = SimpleBlockchain(path, checkpoint_interval=10)
+    try:
+        second = blockchain.validate_chain(workers=workers)
+        assert second['valid'] and second['resumed_from'] == 20 and second['blocks_checked'] == 5
+    finally:
+        blockchain.close()
+
+
+def test_validate_chain_detects_tampering_after_checkpoint(tmp_path):
+    path = str(tmp_path / 'ledger.bin')
+    build_ledger(path, 24, checkpoint_interval=10)
+    blockchain = SimpleBlockchain(path, checkpoint_interval=10)
+    blockchain.validate_chain(workers=1)
+    blockchain.close()
+
+    # Rewrite one payload byte of block 22 in place, keeping the record length
+    target = f'"content_hash":"{21:064x}"'.encode()
+    with open(path, 'r+b') as f:
+        data = f.read()
+        position = data.index(target) + len(b'"content_hash":"')
+        f.seek(position)
+        f.write(b'f')
+
+    blockchain = SimpleBlockchain(path, checkpoint_interval=10)
+    try:
+        report = blockchain.validate_chain(workers=1)
+        assert not report['valid']
+        assert report['first_invalid_index'] == 22
+    finally:
+        blockchain.close()
@@ -0,0 +1,32 @@
+from deepfake_immunization__toolkit import PerceptualHashIndex
+
+
+def test_find_returns_closest_within_radius():
+    index = PerceptualHashIndex(max_distance=6)
+    index.add(0b1011, 'far', version='v1')
+    index.add(0b0001, 'near', version='v1')
+
+    assert index.find(0b0000, version='v1') == ('near', 1)
+    assert index.find(0xFFFF, version='v1') is None
+
+
+def test_new_version_replaces_old_entries():
+    index = PerceptualHashIndex(max_distance=6)
+    index.add(0b0001, 'old', version='v1')
+
+    assert index.find(0b0001, version='v2') is None
+    index.add(0b0011, 'new', version='v2')
+    assert len(index) == 1
+    assert index.find(0b0001, version='v2') == ('new', 1)
+
+
+def test_oldest_entries_are_evicted():
+    index = PerceptualHashIndex(max_distance=0, max_entries=2)
+    for value in (1, 2, 3):
+        index.add(value, value)
+
+    assert len(index) == 2
+    assert index.find(1) is None
+    assert index.find(3) == (3, 0)
+    # The first entry (position 0) is gone from every bucket table too
+    assert all(0 not in bucket for table in index.tables for bucket in table.values())
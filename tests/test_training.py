@@ -0,0 +1,34 @@
+import os
+
+import numpy as np
+
+from deepfake_immunization__toolkit import DeepfakeDetector, DetectorTrainer
+
+
+def write_shard(directory, samples=8, image_size=32):
+    rng = np.random.default_rng(0)
+    prefix = os.path.join(directory, 'shard-00000')
+    np.save(prefix + '.images.npy', rng.integers(0, 256, (samples, 3, image_size, image_size), dtype=np.uint8))
+    np.save(prefix + '.labels.npy', np.arange(samples, dtype=np.int64) % 2)
+    return [prefix]
+
+
+def train(shards, checkpoint_path):
+    trainer = DetectorTrainer(DeepfakeDetector(), shards, batch_size=4, num_workers=0, precision='fp32',
+                              checkpoint_path=checkpoint_path, checkpoint_every=1, device='cpu')
+    return trainer.run()
+
+
+def test_finished_run_promotes_checkpoint_and_next_run_trains(tmp_path):
+    shards = write_shard(str(tmp_path))
+    checkpoint_path = str(tmp_path / 'detector.pt')
+
+    first = train(shards, checkpoint_path)
+    assert first['steps'] == 2
+    assert os.path.exists(checkpoint_path)
+    assert not os.path.exists(checkpoint_path + '.train')
+    assert not os.path.exists(checkpoint_path + '.partial')
+
+    second = train(shards, checkpoint_path)
+    assert second['resumed_from'] == {'epoch': 0, 'step': 0}
+    assert second['steps'] == 2
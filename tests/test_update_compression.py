@@ -0,0 +1,126 @@
+import struct
+import zlib
+
+import numpy as np
+import pytest
+import torch
+import torch.nn as nn
+
+from deepfake_immunization__toolkit import (
+    FederatedLearning, UpdateCompressor, decode_client_update, flatten_state_dict, state_dict_layout
+)
+
+
+def perturbed(state_dict, scale, seed):
+    generator = torch.Generator().manual_seed(seed)
+    return {name: tensor + scale * torch.randn(tensor.shape, generator=generator)
+            for name, tensor in state_dict.items()}
+
+
+@pytest.fixture
+def global_state():
+    torch.manual_seed(0)
+    return nn.Sequential(nn.Linear(8, 6), nn.Linear(6, 2)).state_dict()
+
+
+def flat_delta(state_dict, global_state):
+    layout, num_elements = state_dict_layout(global_state)
+    return (flatten_state_dict(state_dict, layout, num_elements)
+            - flatten_state_dict(global_state, layout, num_elements))
+
+
+def test_topk_round_trip_sends_largest_entries(global_state):
+    trained = perturbed(global_state, 0.1, 1)
+    delta = flat_delta(trained, global_state)
+    compressor = UpdateCompressor(global_state, topk_ratio=0.25, quantize=False, error_feedback=False)
+
+    base_round, num_elements, indices, values = decode_client_update(compressor.encode(trained, global_state, 3))
+
+    k = int(num_elements * 0.25)
+    assert base_round == 3 and num_elements == delta.numel()
+    assert torch.equal(indices, torch.topk(delta.abs(), k).indices.sort().values)
+    torch.testing.assert_close(values, delta[indices].float().double())
+
+
+def test_dense_round_trip(global_state):
+    trained = perturbed(global_state, 0.1, 2)
+    compressor = UpdateCompressor(global_state, topk_ratio=1.0, quantize=False)
+
+    _, num_elements, indices, values = decode_client_update(compressor.encode(trained, global_state))
+
+    assert torch.equal(indices, torch.arange(num_elements))
+    torch.testing.assert_close(values, flat_delta(trained, global_state).float().double())
+
+
+def test_int8_round_trip_is_within_half_a_step(global_state):
+    trained = perturbed(global_state, 0.1, 3)
+    delta = flat_delta(trained, global_state)
+    compressor = UpdateCompressor(global_state, topk_ratio=1.0, quantize=True, error_feedback=False)
+
+    _, _, indices, values = decode_client_update(compressor.encode(trained, global_state))
+
+    step = delta.abs().max().item() / 127
+    assert (values - delta[indices]).abs().max().item() <= step / 2 + 1e-9
+
+
+def test_error_feedback_carries_what_was_not_sent(global_state):
+    trained = perturbed(global_state, 0.1, 4)
+    delta = flat_delta(trained, global_state)
+    compressor = UpdateCompressor(global_state, topk_ratio=0.1, quantize=True, error_feedback=True)
+
+    _, _, indices, values = decode_client_update(compressor.encode(trained, global_state))
+    sent = torch.zeros_like(delta)
+    sent[indices] = values
+
+    torch.testing.assert_close(compressor.residual + sent, delta)
+    # With no new training, the next update sends the largest carried entries
+    residual = compressor.residual.clone()
+    _, _, next_indices, next_values = decode_client_update(compressor.encode(global_state, global_state))
+    assert torch.equal(next_indices, torch.topk(residual.abs(), len(indices)).indices.sort().values)
+    assert (next_values - residual[next_indices]).abs().max().item() <= residual.abs().max().item() / 254 + 1e-9
+
+
+def test_sync_round_with_deltas_matches_full_state_averaging(global_state):
+    clients = [(perturbed(global_state, 0.1, seed), size) for seed, size in ((5, 10), (6, 30))]
+
+    def aggregate(as_deltas):
+        model = nn.Sequential(nn.Linear(8, 6), nn.Linear(6, 2))
+        model.load_state_dict(global_state)
+        federated_learning = FederatedLearning(model)
+        for state_dict, data_size in clients:
+            update = state_dict
+            if as_deltas:
+                compressor = UpdateCompressor(global_state, topk_ratio=1.0, quantize=False)
+                update = compressor.encode(state_dict, global_state)
+            federated_learning.add_client_update(update, data_size)
+        federated_learning.aggregate_updates()
+        return model.state_dict()
+
+    full, deltas = aggregate(False), aggregate(True)
+    for name in full:
+        torch.testing.assert_close(deltas[name], full[name], atol=1e-6, rtol=1e-5)
+
+
+def message(num_elements, k, gaps, values, flags=0):
+    index_bytes = zlib.compress(np.asarray(gaps, dtype='<u4').tobytes())
+    header = UpdateCompressor.HEADER.pack(UpdateCompressor.MAGIC, flags, 0, num_elements, k, 1.0)
+    return header + struct.pack('<I', len(index_bytes)) + index_bytes + np.asarray(values, dtype='<f4').tobytes()
+
+
+@pytest.mark.parametrize('payload', [
+    message(4, 2, [1, 5], [0.1, 0.2]),          # index 6 beyond 4 elements
+    message(4, 5, [0, 1, 1, 1, 1], [0.1] * 5),  # k > num_elements
+    message(4, 2, [1, 0], [0.1, 0.2]),          # repeated index
+    message(4, 2, [0, 1], [0.1]),               # value section too short
+    message(4, 2, [0, 1], [0.1, 0.2])[:20],     # truncated header
+    b'XXXX' + message(4, 1, [0], [0.1])[4:],    # wrong magic
+])
+def test_malformed_messages_are_rejected(payload):
+    with pytest.raises(ValueError):
+        decode_client_update(payload)
+
+
+def test_well_formed_hand_built_message_decodes():
+    _, _, indices, values = decode_client_update(message(4, 2, [1, 2], [0.5, -0.5]))
+    assert indices.tolist() == [1, 3]
+    torch.testing.assert_close(values, torch.tensor([0.5, -0.5], dtype=torch.float64))
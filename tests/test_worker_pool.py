@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from deepfake_immunization__toolkit import DeepfakeDetector, DeepfakeImmunizationToolkit, InferenceWorkerPool
+
+
+def test_pool_verdicts_are_cached_under_fp32_version():
+    toolkit = DeepfakeImmunizationToolkit(inference_mode='dynamic_int8')
+    assert toolkit.model_version.split('-')[3] == 'dynamic_int8'
+
+    toolkit.start_worker_pool(1)
+    try:
+        assert toolkit.model_version.split('-')[3] == 'fp32'
+    finally:
+        toolkit.stop_worker_pool()
+    assert toolkit.model_version.split('-')[3] == 'dynamic_int8'
+
+
+def test_dead_worker_fails_pending_requests():
+    pool = InferenceWorkerPool(DeepfakeDetector().eval(), num_workers=1)
+    try:
+        pool.workers[0].terminate()
+        pool.workers[0].join()
+        # Fails either on submit (already marked broken) or once the collector notices the dead worker
+        with pytest.raises(RuntimeError):
+            pool.submit(np.zeros((32, 32, 3), dtype=np.uint8)).result(timeout=30)
+        with pytest.raises(RuntimeError):
+            pool.submit(np.zeros((32, 32, 3), dtype=np.uint8))
+    finally:
+        pool.close()